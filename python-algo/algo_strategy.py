@@ -3,7 +3,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 
 
 """
@@ -43,6 +42,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = []
+        self.last_game_state = None
 
     def on_turn(self, turn_state):
         """
@@ -59,6 +59,21 @@ class AlgoStrategy(gamelib.AlgoCore):
         self.starter_strategy(game_state)
 
         game_state.submit_turn()
+        # Keep the board we built, on_idle precomputes the next turn from it
+        self.last_game_state = game_state
+
+    def on_idle(self, turn_state):
+        """
+        While the engine runs the action phase, precompute the threat map and the scout paths of the board we built.
+        They are reused next turn by least_damage_spawn_location if the structures on the board did not change.
+        """
+        if self.last_game_state is None:
+            return
+        game_state = self.last_game_state.fork()
+        board = self.structure_signature(game_state)
+        yield board, game_state.threat_map(0)
+        # The paths are cached by the path finder, so this only warms its cache for the next turn
+        game_state.find_paths_to_edge_batch([[13, 0], [14, 0]])
 
 
     """
@@ -179,31 +194,47 @@ class AlgoStrategy(gamelib.AlgoCore):
     def least_damage_spawn_location(self, game_state, location_options):
         """
         This function will help us guess which location is the safest to spawn moving units from.
-        It gets the path the unit will take then checks locations on that path to 
-        estimate the path's damage risk.
+        It gets the path the unit will take then adds up the damage enemy turrets 
+        can deal on each location of that path to estimate the path's damage risk.
         """
-        damages = []
+        # Skip locations walled off from their target edge, units spawned there would self destruct
+        reachable_options = [location for location in location_options if game_state.game_map.can_reach_edge(location, game_state.get_target_edge(location))]
+        if reachable_options:
+            location_options = reachable_options
+
+        # Damage per frame enemy turrets can deal at each location, computed once for all paths
+        # or during the last action phase by on_idle if the board did not change since
+        if self.idle_result is not None and self.idle_result[0] == self.structure_signature(game_state):
+            threat_map = self.idle_result[1]
+        else:
+            threat_map = game_state.threat_map(0)
         # Get the damage estimate each path will take
-        for location in location_options:
-            path = game_state.find_path_to_edge(location)
-            damage = 0
-            for path_location in path:
-                # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
-            damages.append(damage)
+        paths = game_state.find_paths_to_edge_batch(location_options)
+        damages = [game_state.path_damage(path, SCOUT, threat_map) for path in paths]
         
         # Now just return the location that takes the least damage
         return location_options[damages.index(min(damages))]
 
     def detect_enemy_unit(self, game_state, unit_type=None, valid_x = None, valid_y = None):
         total_units = 0
-        for location in game_state.game_map:
-            if game_state.contains_stationary_unit(location):
-                for unit in game_state.game_map[location]:
-                    if unit.player_index == 1 and (unit_type is None or unit.unit_type == unit_type) and (valid_x is None or location[0] in valid_x) and (valid_y is None or location[1] in valid_y):
-                        total_units += 1
+        for structure_type in [WALL, SUPPORT, TURRET]:
+            if unit_type is not None and structure_type != unit_type:
+                continue
+            if valid_x is None and valid_y is None:
+                total_units += game_state.game_map.count(1, structure_type)
+                continue
+            for unit in game_state.game_map.units_of(1, structure_type):
+                if (valid_x is None or unit.x in valid_x) and (valid_y is None or unit.y in valid_y):
+                    total_units += 1
         return total_units
         
+    def structure_signature(self, game_state):
+        """
+        Describes the structures on the board, two boards with the same signature have the same threat map.
+        """
+        game_map = game_state.game_map
+        return game_map.structure_type.tobytes() + bytes(game_map.structure_upgraded)
+
     def filter_blocked_locations(self, locations, game_state):
         filtered = []
         for location in locations:
@@ -219,9 +250,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
+        # ActionFrame reuses the state decoded by AlgoCore and only builds units if we ask for them
+        frame = gamelib.ActionFrame(turn_string, self.config)
+        breaches = frame.events["breach"]
         for breach in breaches:
             location = breach[0]
             unit_owner_self = True if breach[4] == 1 else False
@@ -13,6 +13,9 @@ Investigating it is useful for any player that wants to access information about
 The AlgoCore class in algocore.py handles communication with the game engine, and forms the bones of an algo. AlgoStrategy inherits from it. 
 Investigating it is useful for advanced players interested in getting data from the action phase or communicating directly with the game engine. \n
 
+The ActionFrame class in action_frame.py is a view of a single action phase frame, which only builds GameUnits when they are accessed. 
+It is useful in on_action_frame, which is called hundreds of times per turn. \n
+
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
@@ -20,10 +23,11 @@ util.py contains a small handful of functions that help with communication, incl
 """
 
 from .algocore import AlgoCore
+from .action_frame import ActionFrame
 from .util import debug_write
 from .game_state import GameState
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, IN_ARENA, ARENA_LOCATIONS
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["action_frame", "algocore", "game_state", "game_map", "navigation", "unit", "util"]
  
\ No newline at end of file
@@ -0,0 +1,84 @@
+import json
+
+from .unit import GameUnit
+
+class ActionFrame:
+    """A read only view of one action phase frame
+
+    The turn info, stats and events are read when the frame is created.
+    The units of each player are only turned into GameUnits the first time p1_units or p2_units is accessed,
+    most frame handlers only need the events.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * turn_info (list): The frame's turnInfo, [message type, turn number, action frame number]
+        * turn_number (int): The current turn number
+        * frame_number (int): The number of this frame in the action phase
+        * p1_stats (list): Your [health, SP, MP, time]
+        * p2_stats (list): Your opponent's [health, SP, MP, time]
+        * events (dict): The events of this frame, such as events["breach"] and events["death"]
+
+    """
+    def __init__(self, frame_string, config):
+        """ Reads the frame's summary
+
+        Args:
+            * frame_string (string): An action frame message. If it is a StateString, its decoded state is reused.
+            * config (JSON): A json object containing information about the game
+
+        """
+        state = getattr(frame_string, "state", None)
+        if state is None:
+            state = json.loads(frame_string)
+        self.config = config
+        self._state = state
+        self._units = [None, None]
+        self.turn_info = state["turnInfo"]
+        self.turn_number = int(self.turn_info[1])
+        self.frame_number = int(self.turn_info[2])
+        self.p1_stats = state.get("p1Stats")
+        self.p2_stats = state.get("p2Stats")
+        self.events = state.get("events", {})
+
+    @property
+    def p1_units(self):
+        """Your units in this frame, as a list of GameUnits
+        """
+        if self._units[0] is None:
+            self._units[0] = self.__create_units(self._state.get("p1Units", []), 0)
+        return self._units[0]
+
+    @property
+    def p2_units(self):
+        """Your opponent's units in this frame, as a list of GameUnits
+        """
+        if self._units[1] is None:
+            self._units[1] = self.__create_units(self._state.get("p2Units", []), 1)
+        return self._units[1]
+
+    def __create_units(self, units, player_index):
+        """
+        Builds the GameUnits of a player, marking structures pending removal or upgraded like GameState does.
+        """
+        from .game_state import REMOVE, UPGRADE
+        typedef = self.config.get("unitInformation")
+        created = []
+        structures = {}
+        for i, unit_types in enumerate(units):
+            unit_type = typedef[i].get("shorthand")
+            for uinfo in unit_types:
+                sx, sy, shp = uinfo[:3]
+                x, y = map(int, [sx, sy])
+                # This depends on RM and UP always being the last types to be processed
+                if unit_type == REMOVE:
+                    if (x, y) in structures:
+                        structures[x, y].pending_removal = True
+                elif unit_type == UPGRADE:
+                    if (x, y) in structures:
+                        structures[x, y].upgrade()
+                else:
+                    unit = GameUnit(unit_type, self.config, player_index, float(shp), x, y)
+                    if unit.stationary:
+                        structures[x, y] = unit
+                    created.append(unit)
+        return created
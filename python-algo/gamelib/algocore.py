@@ -1,8 +1,68 @@
+import io
 import json
+import queue
+import select
+import sys
+import threading
+import traceback
 
 from .game_state import GameState
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
+def _read_turn_info(message):
+    """Reads turnInfo from a raw engine message without decoding the rest of it
+
+    Returns:
+        The turnInfo list, or None if it could not be found
+
+    """
+    start = message.find('"turnInfo"')
+    if start < 0:
+        return None
+    start = message.find('[', start)
+    end = message.find(']', start)
+    if start < 0 or end < 0:
+        return None
+    try:
+        return [int(value) for value in message[start + 1:end].split(',')]
+    except ValueError:
+        return None
+
+def _has_events(message, event_names):
+    """Checks if any of the named event lists of a raw action frame message is not empty
+    """
+    for name in event_names:
+        start = message.find('"{}"'.format(name))
+        if start < 0:
+            continue
+        start = message.find('[', start)
+        if start >= 0 and message[start + 1:start + 64].lstrip()[:1] != ']':
+            return True
+    return False
+
+def _input_waiting():
+    """Checks if the next message from the engine is already waiting on stdin, where stdin can be polled
+    """
+    try:
+        return bool(select.select([sys.stdin], [], [], 0)[0])
+    except (OSError, ValueError, io.UnsupportedOperation):
+        return False
+
+class StateString(str):
+    """A game state message from the engine, decoded once by AlgoCore.start
+
+    It is still the original string, so handlers that call json.loads on it keep working,
+    but they can read the decoded message from its state attribute instead.
+
+    Attributes :
+        * state (dict): The decoded json message
+
+    """
+    def __new__(cls, message, state):
+        string = super().__new__(cls, message)
+        string.state = state
+        return string
+
 class AlgoCore(object):
     """
     This class handles communication with the game engine. \n
@@ -10,10 +70,34 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * frame_interval (int): If set, every frame_interval-th action frame is passed to on_action_frame
+        * frame_events (list): If set, action frames with one of these events, such as "breach" or "death", are passed to on_action_frame
+        * threaded_frames (bool): If True, action frames are handled by a worker thread so they never delay the next turn
+        * frame_queue_size (int): The number of action frames waiting for the worker before new frames are dropped
+        * dropped_frames (int): The number of action frames dropped because the frame queue was full
+        * idle_result: The last result of the on_idle precomputation started after the previous turn, or None
+
+    When frame_interval or frame_events is set, the other action frames are dropped before they are decoded.
+    Override accept_frame for other filters.
+
+    With threaded_frames, a reader thread drains stdin. Config, turn and end messages are handled on the main thread
+    as soon as they arrive, action frames are put in a bounded queue and passed to on_action_frame by the worker.
+    The worker waits until on_game_start has run and while on_turn runs, so on_turn only overlaps a frame that was already being handled.
+    Frames left in the queue after a turn are handled once on_turn returns.
+    on_action_frame runs on the worker thread and accept_frame on the reader thread, so anything they share
+    with on_turn, such as the path finder's caches, must be safe to use from several threads.
 
     """
     def __init__(self):
         self.config = None
+        self.frame_interval = None
+        self.frame_events = None
+        self.threaded_frames = False
+        self.frame_queue_size = 64
+        self.dropped_frames = 0
+        self.idle_result = None
+        self.__idle = None
+        self.__idle_lock = threading.Lock()
 
     def on_game_start(self, config):
         """
@@ -27,6 +111,7 @@ class AlgoCore(object):
         """
         This step function is called at the start of each turn.
         It is passed the current game state, which can be used to initiate a new GameState object. 
+        The game state is a StateString, GameState reuses its decoded state.
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -40,9 +125,35 @@ class AlgoCore(object):
         The action phase is made up of a sequence of distinct frames. 
         Each of these frames is sent to the algo in order. 
         They can be handled in this function. 
+        The frame is a StateString, read its state attribute instead of decoding it again.
         """
         pass
 
+    def on_idle(self, game_state):
+        """
+        This function is called after on_turn returns, with the same game state, while the engine runs the action phase.
+        It can return a generator to precompute things for the next turn, such as paths and threat maps of the board you built.
+        The generator is stepped once after each action frame, including frames dropped by accept_frame, and closed when
+        the next turn starts. A step is skipped when the next message is already waiting on stdin. Messages Python
+        has already buffered can not be seen, nor can stdin be polled on Windows, so keep each step short:
+        a step that has started delays reading the next turn. With threaded_frames, the worker steps it whenever no frame is waiting.
+        The last value it yielded or returned is idle_result during the next on_turn.
+        By default, there is nothing to precompute.
+        """
+        return None
+
+    def accept_frame(self, turn_info, frame_string):
+        """
+        Decides if an action frame is decoded and passed to on_action_frame, from the raw message.
+        By default every frame is accepted, unless frame_interval or frame_events is set. 
+        A frame is then accepted if its frame number is a multiple of frame_interval, 
+        or if one of its frame_events lists is not empty.
+        """
+        if self.frame_interval is None and self.frame_events is None:
+            return True
+        if self.frame_interval is not None and turn_info[2] % self.frame_interval == 0:
+            return True
+        return self.frame_events is not None and _has_events(frame_string, self.frame_events)
 
     def start(self):
         """ 
@@ -53,43 +164,185 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        if self.threaded_frames:
+            self.__start_threaded()
+            return
+
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
             game_state_string = get_command()
-            if "replaySave" in game_state_string:
+            if not self.__handle_message(game_state_string):
+                break
+
+    def __handle_message(self, game_state_string):
+        """
+        Passes one message from the game engine to its handler. Returns False once the game is over.
+        """
+        if "replaySave" in game_state_string:
+            """
+            This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+            """
+            parsed_config = json.loads(game_state_string)
+            self.on_game_start(parsed_config)
+        elif "turnInfo" in game_state_string:
+            # Drop unwanted action frames from their turnInfo alone, before decoding them
+            turn_info = _read_turn_info(game_state_string)
+            if turn_info is not None and turn_info[0] == 1 and not self.accept_frame(turn_info, game_state_string):
+                self.__step_idle_if_free()
+                return True
+            # Decode each message once, handlers get the decoded state with the string
+            state = json.loads(game_state_string)
+            game_state_string = StateString(game_state_string, state)
+            stateType = int(state.get("turnInfo")[0])
+            if stateType == 0:
                 """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+                This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                deploy phase. Printing is handled by the provided functions.
                 """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
-                else:
-                    """
-                    Something is wrong? Received an incorrect or improperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+                self.__cancel_idle()
+                self.on_turn(game_state_string)
+                self.idle_result = None
+                self.__idle = self.on_idle(game_state_string)
+            elif stateType == 1:
+                """
+                If stateType == 1, this game_state_string string represents a single frame of an action phase
+                """
+                self.on_action_frame(game_state_string)
+                self.__step_idle_if_free()
+            elif stateType == 2:
+                """
+                This is the end game message. This means the game is over so break and finish the program.
+                """
+                debug_write("Got end state, game over. Stopping algo.")
+                self.__cancel_idle()
+                return False
             else:
                 """
                 Something is wrong? Received an incorrect or improperly formatted string.
                 """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+                debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+        else:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string : {}".format(game_state_string))
+        return True
+
+    def __start_threaded(self):
+        """
+        The parsing loop of the threaded_frames mode. The main thread only handles config, turn and end messages.
+        """
+        messages = queue.Queue()
+        self.__frames = queue.Queue(self.frame_queue_size)
+        # Set once the config is handled, and cleared while a turn is handled
+        self.__frames_ready = threading.Event()
+        self.__started = False
+        reader = threading.Thread(target=self.__read_messages, args=(messages,), daemon=True)
+        worker = threading.Thread(target=self.__handle_frames, daemon=True)
+        reader.start()
+        worker.start()
+
+        running = True
+        while running:
+            game_state_string = messages.get()
+            if game_state_string is None:
+                break
+            self.__frames_ready.clear()
+            try:
+                running = self.__handle_message(game_state_string)
+            finally:
+                self.__started = self.__started or "replaySave" in game_state_string
+                if self.__started:
+                    self.__frames_ready.set()
+            if self.__idle is not None:
+                # Wake the worker up to step the new on_idle generator, even if every frame is dropped
+                try:
+                    self.__frames.put_nowait("")
+                except queue.Full:
+                    pass
+
+        # The worker stops once it has handled the frames still in the queue, or dropped them if the game never started
+        self.__frames_ready.set()
+        self.__frames.put(None)
+        worker.join()
+
+    def __read_messages(self, messages):
+        """
+        Reads stdin on the reader thread. Action frames go to the frame queue, other messages to the main thread.
+        """
+        try:
+            while True:
+                game_state_string = get_command()
+                turn_info = _read_turn_info(game_state_string) if "turnInfo" in game_state_string else None
+                if turn_info is not None and turn_info[0] == 1:
+                    if self.accept_frame(turn_info, game_state_string):
+                        try:
+                            self.__frames.put_nowait(game_state_string)
+                        except queue.Full:
+                            self.dropped_frames += 1
+                    continue
+                messages.put(game_state_string)
+                if turn_info is not None and turn_info[0] == 2:
+                    return
+        except SystemExit:
+            # get_command exits once stdin is closed
+            messages.put(None)
+
+    def __handle_frames(self):
+        """
+        Passes action frames to on_action_frame on the worker thread, waiting for the config and while a turn is handled.
+        """
+        while True:
+            try:
+                frame_string = self.__frames.get_nowait()
+            except queue.Empty:
+                # Use the time between frames to step the on_idle generator
+                if self.__idle is not None and self.__frames_ready.is_set():
+                    self.__step_idle()
+                    continue
+                frame_string = self.__frames.get()
+            if frame_string is None:
+                return
+            self.__frames_ready.wait()
+            if not self.__started or not frame_string:
+                # An empty string only wakes the worker up
+                continue
+            try:
+                self.on_action_frame(StateString(frame_string, json.loads(frame_string)))
+            except Exception:
+                debug_write(traceback.format_exc())
+            self.__step_idle()
+
+    def __step_idle(self):
+        """
+        Runs one step of the on_idle generator, keeping what it yields in idle_result.
+        """
+        with self.__idle_lock:
+            if self.__idle is None:
+                return
+            try:
+                self.idle_result = next(self.__idle)
+            except StopIteration as done:
+                if done.value is not None:
+                    self.idle_result = done.value
+                self.__idle = None
+            except Exception:
+                debug_write(traceback.format_exc())
+                self.__idle = None
+
+    def __step_idle_if_free(self):
+        """
+        Steps the on_idle generator, unless the next message is already waiting.
+        """
+        if self.__idle is not None and not _input_waiting():
+            self.__step_idle()
+
+    def __cancel_idle(self):
+        """
+        Closes the on_idle generator, its results so far stay in idle_result.
+        """
+        with self.__idle_lock:
+            if self.__idle is not None:
+                self.__idle.close()
+                self.__idle = None
@@ -1,13 +1,72 @@
+import copy
 import math
+from array import array
 from .unit import GameUnit
 from .util import debug_write
 
+def _arena_contains(x, y, arena_size=28):
+    """Checks if a location is inside the diamond shaped game board, for any numeric coordinates
+    """
+    half_board = arena_size // 2
+
+    row_size = y + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < half_board and x >= startx and x <= endx)
+
+    row_size = (arena_size - 1 - y) + 1
+    startx = half_board - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= half_board and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+# IN_ARENA[x][y] is True for each location inside the diamond shaped game board
+IN_ARENA = tuple(tuple(_arena_contains(x, y) for y in range(28)) for x in range(28))
+# The 420 locations of the game board as (x, y) tuples, in the order GameMap iterates them: row by row from [13, 0]
+ARENA_LOCATIONS = tuple((x, y) for y in range(28) for x in range(28) if IN_ARENA[x][y])
+
+class _Tile(list):
+    """The list of units at a location of a GameMap
+
+    Adding or removing units through the list updates the structure arrays and the unit index of its map.
+    Once the map stops holding the list, after remove_unit or an assignment, changing it no longer changes the map.
+    """
+    __slots__ = ("_game_map", "_index")
+
+    def __init__(self, game_map, index, units=()):
+        list.__init__(self, units)
+        self._game_map = game_map
+        self._index = index
+
+    def __reduce_ex__(self, protocol):
+        # Copies are built from the units, they are not held by the map until it stores them
+        return (_Tile, (self._game_map, self._index, list(self)))
+
+def _copy_unit(unit):
+    """A faster copy.copy for GameUnits
+    """
+    unit_copy = GameUnit.__new__(GameUnit)
+    unit_copy.__dict__.update(unit.__dict__)
+    return unit_copy
+
+def _tile_change(method):
+    def change(tile, *args):
+        return tile._game_map._change_tile(tile, method, args)
+    change.__name__ = method.__name__
+    return change
+
+for _method in [list.append, list.extend, list.insert, list.remove, list.pop, list.clear,
+        list.__setitem__, list.__delitem__, list.__iadd__, list.__imul__]:
+    setattr(_Tile, _method.__name__, _tile_change(_method))
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
 
     game_map[x, y] will return a list of Units located at that location, 
-    or an empty list if there are no units at the location
+    or an empty list if there are no units at the location.
+    Adding or removing units through that list, such as game_map[x, y].append(unit), updates the map like add_unit and remove_unit.
 
     Attributes :
         * config (JSON): Contains information about the current game rules
@@ -18,8 +77,29 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * blocked_mask (bytearray): 1 at index x * ARENA_SIZE + y for each location holding a structure, 0 otherwise.
+          Kept up to date by add_unit, remove_unit and item assignment.
+        * structure_type (array): The index in config["unitInformation"] of the structure at each location, -1 if there is none
+        * structure_owner (bytearray): The player index of the structure at each location
+        * structure_health (array): The health of the structure at each location
+        * structure_upgraded (bytearray): 1 for each location holding an upgraded structure
+        * structure_pending_removal (bytearray): 1 for each location holding a structure marked for removal by its owner
+
+    The locations of the units of each player and type are indexed, see units_of and count.
+
+    get_locations_in_range adds precomputed offsets to the location. The offsets of each radius are shared by every GameMap.
+
+    Structures are stored in the parallel structure arrays, indexed like blocked_mask. The list of GameUnits
+    at a location is only built the first time game_map[x, y] is accessed, and the same list is returned afterwards.
+    Mobile units are kept in those per location lists. The arrays describe the units as they were placed,
+    changing the attributes of a GameUnit does not update them.
+
+    The open locations are split into regions, the pockets of pathable space units can move within.
+    The regions are labeled again the first time they are queried after blocked_mask changed.
 
     """
+    _stencils = {}
+
     def __init__(self, config):
         """Initializes constants and game map
 
@@ -35,45 +115,126 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
-        self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__tiles = {}
+        self.__unit_index = {}
+        self.__undo_log = None
+        self.__undo_depth = 0
+        self.blocked_mask = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.structure_type = array('b', [-1]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self.structure_owner = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.structure_health = array('d', [0.0]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self.structure_upgraded = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.structure_pending_removal = bytearray(self.ARENA_SIZE * self.ARENA_SIZE)
+        self.__position = 0
+        self.__regions_key = None
+        self.__regions = None
+        self.__region_edges = None
+        self.__region_indices = None
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
-            return self.__map[x][y]
+            return self.__tile(x * self.ARENA_SIZE + y)
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            index = location[0] * self.ARENA_SIZE + location[1]
+            self.__record(index)
+            self.__unindex_location(index)
+            self.__tiles[index] = tile = _Tile(self, index, val)
+            self.__index_tile(index, tile)
             return
         self._invalid_coordinates(location)
 
+    def _change_tile(self, tile, method, args):
+        """Applies a list method to the units at a location, then updates the structure arrays and the unit index
+        """
+        index = tile._index
+        if self.__tiles.get(index) is not tile:
+            return method(tile, *args)
+        self.__record(index)
+        self.__unindex_location(index)
+        result = method(tile, *args)
+        self.__index_tile(index, tile)
+        return result
+
+    def __tile(self, index):
+        """Gets the list of units at a location, building it from the structure arrays the first time
+        """
+        tile = self.__tiles.get(index)
+        if tile is None:
+            tile = _Tile(self, index)
+            type_index = self.structure_type[index]
+            if type_index >= 0:
+                x, y = index // self.ARENA_SIZE, index % self.ARENA_SIZE
+                unit_type = self.config["unitInformation"][type_index]["shorthand"]
+                unit = GameUnit(unit_type, self.config, self.structure_owner[index], self.structure_health[index], x, y)
+                if self.structure_upgraded[index]:
+                    unit.upgrade()
+                unit.pending_removal = bool(self.structure_pending_removal[index])
+                list.append(tile, unit)
+            self.__tiles[index] = tile
+        return tile
+
+    def __index_unit(self, player_index, unit_type, index):
+        key = (player_index, unit_type)
+        indices = self.__unit_index.get(key)
+        if indices is None:
+            indices = self.__unit_index[key] = set()
+        indices.add(index)
+
+    def __index_tile(self, index, tile):
+        """Stores the first structure of a list of units in the structure arrays and indexes its mobile units
+        """
+        structure = next((unit for unit in tile if unit.stationary), None)
+        if structure is None:
+            self.__clear_structure(index)
+        else:
+            self.__store_structure(index, structure)
+        for unit in tile:
+            if not unit.stationary:
+                self.__index_unit(unit.player_index, unit.unit_type, index)
+
+    def __unindex_location(self, index):
+        """Removes every unit at a location from the unit index
+        """
+        type_index = self.structure_type[index]
+        if type_index >= 0:
+            unit_type = self.config["unitInformation"][type_index]["shorthand"]
+            self.__unit_index[(self.structure_owner[index], unit_type)].discard(index)
+        for unit in self.__tiles.get(index, []):
+            if not unit.stationary:
+                self.__unit_index.get((unit.player_index, unit.unit_type), set()).discard(index)
+
+    def __store_structure(self, index, unit):
+        from .game_state import UNIT_TYPE_TO_INDEX
+        self.__index_unit(unit.player_index or 0, unit.unit_type, index)
+        self.structure_type[index] = UNIT_TYPE_TO_INDEX[unit.unit_type]
+        self.structure_owner[index] = unit.player_index or 0
+        self.structure_health[index] = unit.health
+        self.structure_upgraded[index] = unit.upgraded
+        self.structure_pending_removal[index] = unit.pending_removal
+        self.blocked_mask[index] = 1
+
+    def __clear_structure(self, index):
+        self.structure_type[index] = -1
+        self.structure_owner[index] = 0
+        self.structure_health[index] = 0
+        self.structure_upgraded[index] = 0
+        self.structure_pending_removal[index] = 0
+        self.blocked_mask[index] = 0
+
     def __iter__(self):
-        self.__start = [13,0]
-        return self
+        self.__position = 0
+        return ([x, y] for x, y in ARENA_LOCATIONS)
     
     def __next__(self):
-        location = self.__start
-        if location == [15,27]:
+        if self.__position == len(ARENA_LOCATIONS):
             raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
-
-    def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+        x, y = ARENA_LOCATIONS[self.__position]
+        self.__position += 1
+        return [x, y]
 
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
@@ -89,19 +250,9 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        if type(x) == int and type(y) == int:
+            return 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE and IN_ARENA[x][y]
+        return _arena_contains(x, y, self.ARENA_SIZE)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -167,11 +318,82 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
+        index = x * self.ARENA_SIZE + y
+        self.__record(index)
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            list.append(self.__tile(index), new_unit)
+            self.__index_unit(player_index, unit_type, index)
+        else:
+            self.__unindex_location(index)
+            self.__tiles[index] = _Tile(self, index, [new_unit])
+            self.__store_structure(index, new_unit)
+
+    def _load_unit(self, type_index, player_index, health, x, y):
+        """Adds a unit read from a serialized game state. Structures are only written to the structure arrays.
+        """
+        index = x * self.ARENA_SIZE + y
+        self.__record(index)
+        type_config = self.config["unitInformation"][type_index]
+        if type_config["unitCategory"] == 0:
+            if self.structure_type[index] >= 0:
+                self.__unit_index[(self.structure_owner[index], self.config["unitInformation"][self.structure_type[index]]["shorthand"])].discard(index)
+            self.__index_unit(player_index, type_config["shorthand"], index)
+            self.structure_type[index] = type_index
+            self.structure_owner[index] = player_index
+            self.structure_health[index] = health
+            self.structure_upgraded[index] = 0
+            self.structure_pending_removal[index] = 0
+            self.blocked_mask[index] = 1
+            if index in self.__tiles:
+                list.append(self.__tile(index), GameUnit(type_config["shorthand"], self.config, player_index, health, x, y))
         else:
-            self.__map[x][y] = [new_unit]
+            list.append(self.__tile(index), GameUnit(type_config["shorthand"], self.config, player_index, health, x, y))
+            self.__index_unit(player_index, type_config["shorthand"], index)
+
+    def upgrade_structure(self, location):
+        """Upgrades the structure at a location, if there is one.
+
+        Args:
+            location: The location of the structure
+
+        This function does not affect your turn and only changes the data stored in GameMap. Use GameState.attempt_upgrade to upgrade your structures.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        if self.structure_type[index] < 0:
+            return
+        self.__record(index)
+        self.structure_upgraded[index] = 1
+        for unit in (self.__tile(index) if index in self.__tiles else []):
+            if unit.stationary:
+                unit.upgrade()
+                break
+
+    def set_pending_removal(self, location):
+        """Marks the structure at a location for removal by its owner, if there is one.
+
+        Args:
+            location: The location of the structure
+
+        This function does not affect your turn and only changes the data stored in GameMap. Use GameState.attempt_remove to remove your structures.
+        """
+        if not self.in_arena_bounds(location):
+            self._invalid_coordinates(location)
+            return
+        x, y = location
+        index = x * self.ARENA_SIZE + y
+        if self.structure_type[index] < 0:
+            return
+        self.__record(index)
+        self.structure_pending_removal[index] = 1
+        for unit in (self.__tile(index) if index in self.__tiles else []):
+            if unit.stationary:
+                unit.pending_removal = True
+                break
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,7 +408,213 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        index = x * self.ARENA_SIZE + y
+        self.__record(index)
+        self.__unindex_location(index)
+        self.__tiles.pop(index, None)
+        self.__clear_structure(index)
+
+    def fork(self):
+        """Creates an independent copy of the map, for trying moves without changing this one
+
+        The structure arrays are copied. The lists of units already built are copied with their GameUnits,
+        the others are built by each map from its own arrays when they are accessed. The config is shared.
+
+        Returns:
+            A new GameMap with the same units
+
+        """
+        game_map = copy.copy(self)
+        game_map.blocked_mask = self.blocked_mask[:]
+        game_map.structure_type = self.structure_type[:]
+        game_map.structure_owner = self.structure_owner[:]
+        game_map.structure_health = self.structure_health[:]
+        game_map.structure_upgraded = self.structure_upgraded[:]
+        game_map.structure_pending_removal = self.structure_pending_removal[:]
+        game_map.__tiles = {index: _Tile(game_map, index, [_copy_unit(unit) for unit in tile]) for index, tile in self.__tiles.items()}
+        game_map.__unit_index = {key: set(indices) for key, indices in self.__unit_index.items()}
+        game_map.__undo_log = None
+        game_map.__undo_depth = 0
+        return game_map
+
+    def __record(self, index):
+        """Adds the current state of a location to the undo log, if changes are being recorded
+        """
+        if self.__undo_log is None:
+            return
+        structure = (self.structure_type[index], self.structure_owner[index], self.structure_health[index],
+            self.structure_upgraded[index], self.structure_pending_removal[index], self.blocked_mask[index])
+        tile = self.__tiles.get(index)
+        # The list and its units can be changed in place, log copies of them
+        self.__undo_log.append((index, None if tile is None else [_copy_unit(unit) for unit in tile], structure))
+
+    def __restore(self, index, tile, structure):
+        self.__unindex_location(index)
+        (self.structure_type[index], self.structure_owner[index], self.structure_health[index],
+            self.structure_upgraded[index], self.structure_pending_removal[index], self.blocked_mask[index]) = structure
+        if tile is None:
+            self.__tiles.pop(index, None)
+        else:
+            self.__tiles[index] = _Tile(self, index, tile)
+            for unit in tile:
+                if not unit.stationary:
+                    self.__index_unit(unit.player_index, unit.unit_type, index)
+        if structure[0] >= 0:
+            self.__index_unit(structure[1], self.config["unitInformation"][structure[0]]["shorthand"], index)
+
+    def _begin_undo(self):
+        """Starts recording changes, used by GameState.transaction
+
+        Returns:
+            A checkpoint that _rollback can return to
+
+        """
+        if self.__undo_log is None:
+            self.__undo_log = []
+        self.__undo_depth += 1
+        return len(self.__undo_log)
+
+    def _rollback(self, checkpoint):
+        """Undoes the changes recorded since a checkpoint, most recent first
+        """
+        undo_log = self.__undo_log
+        while len(undo_log) > checkpoint:
+            self.__restore(*undo_log.pop())
+
+    def _end_undo(self):
+        """Stops recording changes once the outermost transaction ends
+        """
+        self.__undo_depth -= 1
+        if self.__undo_depth == 0:
+            self.__undo_log = None
+
+    def units_of(self, player_index, unit_type):
+        """Gets all the units of a player with a given type, without scanning the map
+
+        Args:
+            player_index: The index corresponding to the player controlling the units, 0 for you 1 for the enemy
+            unit_type: The type of the units. Use the constants provided in algo_strategy.
+
+        Returns:
+            A list of GameUnits, in the order their locations are iterated
+
+        """
+        size = self.ARENA_SIZE
+        units = []
+        for index in sorted(self.__unit_index.get((player_index, unit_type), ()), key=lambda index: (index % size, index // size)):
+            for unit in self.__tile(index):
+                if unit.player_index == player_index and unit.unit_type == unit_type:
+                    units.append(unit)
+        return units
+
+    def count(self, player_index, unit_type):
+        """Counts the units of a player with a given type, without scanning the map
+
+        Args:
+            player_index: The index corresponding to the player controlling the units, 0 for you 1 for the enemy
+            unit_type: The type of the units. Use the constants provided in algo_strategy.
+
+        Returns:
+            The number of units
+
+        """
+        from .game_state import UNIT_TYPE_TO_INDEX
+        indices = self.__unit_index.get((player_index, unit_type), ())
+        if not indices:
+            return 0
+        # There is at most one structure per location
+        if self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]["unitCategory"] == 0:
+            return len(indices)
+        return sum(1 for index in indices for unit in self.__tile(index) if unit.player_index == player_index and unit.unit_type == unit_type)
+
+    def __label_regions(self):
+        """Labels the connected open locations with union-find, if blocked_mask changed since the last labeling
+        """
+        blocked = self.blocked_mask
+        if blocked == self.__regions_key:
+            return
+        self.__regions_key = bytes(blocked)
+
+        parent = list(range(self.ARENA_SIZE * self.ARENA_SIZE))
+        for index, neighbor in _ARENA_LINKS:
+            if blocked[index] or blocked[neighbor]:
+                continue
+            #Find both roots, halving the paths on the way
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            while parent[neighbor] != neighbor:
+                parent[neighbor] = parent[parent[neighbor]]
+                neighbor = parent[neighbor]
+            if index != neighbor:
+                parent[neighbor] = index
+
+        regions = array('i', [-1]) * (self.ARENA_SIZE * self.ARENA_SIZE)
+        labels = {}
+        region_edges = []
+        region_indices = []
+        for index in _ARENA_INDICES:
+            if blocked[index]:
+                continue
+            root = index
+            while parent[root] != root:
+                root = parent[root]
+            label = labels.get(root)
+            if label is None:
+                label = labels[root] = len(region_edges)
+                region_edges.append(0)
+                region_indices.append([])
+            regions[index] = label
+            region_edges[label] |= _EDGE_BITS[index]
+            region_indices[label].append(index)
+        self.__regions = regions
+        self.__region_edges = region_edges
+        self.__region_indices = region_indices
+
+    def region(self, location):
+        """Gets the region of a location. Two locations with the same region are connected by open locations.
+
+        Args:
+            location: A map location
+
+        Returns:
+            The label of the location's region, or -1 if the location is blocked or out of bounds
+
+        """
+        if not self.in_arena_bounds(location):
+            return -1
+        self.__label_regions()
+        return self.__regions[location[0] * self.ARENA_SIZE + location[1]]
+
+    def can_reach_edge(self, location, edge):
+        """Checks if a unit at a location could reach an edge, without searching for its path
+
+        Args:
+            location: A map location
+            edge: A constant corresponding to one of the 4 edges. See game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, and similar constants.
+
+        Returns:
+            True if an open location of the edge is in the location's region, False otherwise or if the location is blocked
+
+        """
+        label = self.region(location)
+        return label >= 0 and bool(self.__region_edges[label] & (1 << edge))
+
+    def region_indices(self, location):
+        """Gets the locations of a location's region
+
+        Args:
+            location: A map location
+
+        Returns:
+            The indices x * ARENA_SIZE + y of the region's locations, ordered by x then y. Empty if the location is blocked.
+            The list is shared by later calls, do not modify it.
+
+        """
+        label = self.region(location)
+        if label < 0:
+            return []
+        return self.__region_indices[label]
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -205,9 +633,16 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
+        if type(x) == int and type(y) == int:
+            stencil = GameMap._stencils.get((radius, getHitRadius))
+            if stencil is None:
+                stencil = self.__build_stencils(radius, getHitRadius)
+            size = self.ARENA_SIZE
+            return [[x + i, y + j] for i, j in stencil if 0 <= x + i < size and 0 <= y + j < size and IN_ARENA[x + i][y + j]]
+
         locations = []
         search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
         for i in range(int(x - search_radius), int(x + search_radius + 1)):
             for j in range(int(y - search_radius), int(y + search_radius + 1)):
                 new_location = [i, j]
@@ -216,6 +651,28 @@ class GameMap:
                     locations.append(new_location)
         return locations
 
+    def __build_stencils(self, radius, getHitRadius):
+        """Caches the offsets within range for radius and every attack and shield range in the config
+
+        Returns:
+            The offsets [i, j] within radius, in the order get_locations_in_range returns them
+
+        """
+        radii = set([radius])
+        for type_config in self.config["unitInformation"]:
+            for stats in [type_config, type_config.get("upgrade", {})]:
+                for key in ["attackRange", "shieldRange"]:
+                    if key in stats:
+                        radii.add(stats[key])
+
+        for stencil_radius in radii:
+            search_radius = int(math.ceil(stencil_radius))
+            offsets = range(-search_radius, search_radius + 1)
+            # A unit with a given range affects all locations who's centers are within that range + get hit radius
+            GameMap._stencils[(stencil_radius, getHitRadius)] = tuple((i, j) for i in offsets for j in offsets
+                if self.distance_between_locations([0, 0], [i, j]) < stencil_radius + getHitRadius)
+        return GameMap._stencils[(radius, getHitRadius)]
+
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
 
@@ -238,3 +695,25 @@ class GameMap:
         """
         if(self.enable_warnings):
             debug_write(message)
+
+
+def _arena_tables():
+    """Flat indices of the arena locations, pairs of adjacent arena locations, and the edges of each location as bits
+    """
+    game_map = GameMap(None)
+    size = game_map.ARENA_SIZE
+    indices = tuple(sorted(x * size + y for x, y in ARENA_LOCATIONS))
+    links = []
+    for index in indices:
+        x, y = index // size, index % size
+        for neighbor in [[x, y + 1], [x + 1, y]]:
+            if game_map.in_arena_bounds(neighbor):
+                links.append((index, neighbor[0] * size + neighbor[1]))
+    edge_bits = bytearray(size * size)
+    for edge, edge_locations in enumerate(game_map.get_edges()):
+        for x, y in edge_locations:
+            edge_bits[x * size + y] |= 1 << edge
+    return indices, tuple(links), bytes(edge_bits)
+
+_ARENA_INDICES, _ARENA_LINKS, _EDGE_BITS = _arena_tables()
+
@@ -1,11 +1,13 @@
+import copy
 import math
 import json
 import sys
+from array import array
 
 from .navigation import ShortestPathFinder
 from .util import send_command, debug_write
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, IN_ARENA
 
 def is_stationary(unit_type):
     """
@@ -101,9 +103,11 @@ class GameState:
     def __parse_state(self, state_line):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, or a StateString that was already decoded.
         """
-        state = json.loads(state_line)
+        state = getattr(state_line, "state", None)
+        if state is None:
+            state = json.loads(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -140,14 +144,11 @@ class GameState:
                 # This depends on RM and UP always being the last types to be processed
                 if unit_type == REMOVE:
                     # Quick fix will deploy engine fix soon
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
+                    self.game_map.set_pending_removal([x, y])
                 elif unit_type == UPGRADE:
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                    self.game_map.upgrade_structure([x, y])
                 else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map._load_unit(i, player_number, hp, x, y)
 
     def __resource_required(self, unit_type):
         return self.SP if is_stationary(unit_type) else self.MP
@@ -445,7 +446,7 @@ class GameState:
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
+                        self.game_map.upgrade_structure([x, y])
                         self._build_stack.append((UPGRADE, x, y))
                         spawned_units += 1
             else:
@@ -475,6 +476,37 @@ class GameState:
         elif right and top:
             return self.game_map.BOTTOM_LEFT
 
+    def fork(self):
+        """Creates an independent copy of this game state, to try spawns and upgrades without changing it.
+        The copy is cheap: the map only copies the units it already built, and the config is shared.
+
+        Returns:
+            A new GameState with the same map, resources and pending builds and deploys
+
+        """
+        state = copy.copy(self)
+        state.game_map = self.game_map.fork()
+        state._build_stack = list(self._build_stack)
+        state._deploy_stack = list(self._deploy_stack)
+        state._player_resources = [dict(resources) for resources in self._player_resources]
+        return state
+
+    def transaction(self):
+        """Records the changes made to this game state so they can be undone.
+        Use it in a with statement. The changes are undone if an exception leaves the block.
+        Transactions can be nested, rolling back the outer one also undoes the inner ones.
+
+            with game_state.transaction() as tx:
+                game_state.attempt_spawn(TURRET, [13, 10])
+                score = evaluate(game_state)
+                tx.rollback()
+
+        Returns:
+            A Transaction. Its rollback method undoes the changes made since the with statement started.
+
+        """
+        return Transaction(self)
+
     def find_path_to_edge(self, start_location, target_edge=None):
         """Gets the path a unit at a given location would take. 
         If final point is not on an edge, it is a self destruct path
@@ -498,6 +530,127 @@ class GameState:
         end_points = self.game_map.get_edge_locations(target_edge)
         return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
 
+    def find_path_result(self, start_location, target_edge=None):
+        """Gets the path a unit at a given location would take, and whether it ends on the target edge.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            A navigation.PathResult with the path, its end type (PathResult.EDGE or PathResult.SELF_DESTRUCT),
+            its length and the tile it ends on. Results are cached, do not modify the path.
+
+        """
+        if self.contains_stationary_unit(start_location):
+            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return
+
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.navigate_result(start_location, end_points, self)
+
+    def walk_path(self, start_location, target_edge=None):
+        """Gets an iterator over the locations a unit would move through, one step at a time.
+        Structures can be added or removed from game_map between steps to simulate an action phase,
+        the unit then changes its path like it would in game.
+
+        Args:
+            start_location: The location of a hypothetical unit
+            target_edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from start_location if None.
+
+        Returns:
+            A navigation.PathWalker yielding locations, starting with start_location
+
+        """
+        if self.contains_stationary_unit(start_location):
+            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            return
+
+        if target_edge is None:
+            target_edge = self.get_target_edge(start_location)
+
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.walk(start_location, end_points, self)
+
+    def find_paths_to_edge_batch(self, start_locations, target_edge=None):
+        """Gets the paths units at each of the given locations would take.
+        Gives the same paths as calling find_path_to_edge on each location, but only searches each target edge once.
+
+        Args:
+            start_locations: A list of locations of hypothetical units
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc. Induced from each start_location if None.
+
+        Returns:
+            A list containing the path for each location in start_locations, in the same order.
+            The entry is None if the location is blocked.
+
+        """
+        paths = [None] * len(start_locations)
+        indices_by_edge = {}
+        for index, start_location in enumerate(start_locations):
+            if self.contains_stationary_unit(start_location):
+                self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+                continue
+            edge = self.get_target_edge(start_location) if target_edge is None else target_edge
+            indices_by_edge.setdefault(edge, []).append(index)
+
+        for edge, indices in indices_by_edge.items():
+            end_points = self.game_map.get_edge_locations(edge)
+            edge_paths = self._shortest_path_finder.navigate_batch([start_locations[index] for index in indices], end_points, self)
+            for index, path in zip(indices, edge_paths):
+                paths[index] = path
+        return paths
+
+    def distance_field(self, target_edge):
+        """Gets the distance of every location to an edge, which can be cheaply updated with hypothetical structures.
+        Use it instead of add_unit and find_path_to_edge when trying many structure placements.
+
+        Args:
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A navigation.DistanceField for the current board. Use its block, unblock and get_path methods.
+
+        """
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.distance_field(end_points, self)
+
+    def edge_fields(self):
+        """Gets the distance of every location to each of the four edges.
+        Useful to predict the paths of both your units and your opponent's.
+
+        Returns:
+            A navigation.EdgeFields. Use its distance and get_path methods with any start location and edge.
+
+        """
+        return self._shortest_path_finder.edge_fields(self)
+
+    def distance_fields_for_layouts(self, target_edge, layouts):
+        """Gets the distance of every location to an edge for each of several hypothetical sets of new structures.
+        Large numbers of layouts are searched together with NumPy when it is available.
+
+        Args:
+            target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+            layouts: A list of layouts. Each layout is a list of locations where a structure would be added to the current board.
+
+        Returns:
+            A list with a navigation.DistanceField for each layout, in the same order
+
+        """
+        size = self.ARENA_SIZE
+        blocked_masks = []
+        for layout in layouts:
+            blocked_mask = bytearray(self.game_map.blocked_mask)
+            for location in layout:
+                if self.game_map.in_arena_bounds(location):
+                    blocked_mask[location[0] * size + location[1]] = 1
+            blocked_masks.append(blocked_mask)
+        end_points = self.game_map.get_edge_locations(target_edge)
+        return self._shortest_path_finder.distance_fields(end_points, blocked_masks, self)
+
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
 
@@ -512,6 +665,8 @@ class GameState:
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
+        if not self.game_map.blocked_mask[x * self.ARENA_SIZE + y]:
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
@@ -645,3 +800,151 @@ class GameState:
                 if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
                     attackers.append(unit)
         return attackers
+
+    def threat_map(self, player_index):
+        """Gets the damage per frame enemy structures can deal to a unit of the given player at every location.
+        Compute it once and pass it to path_damage to evaluate many paths.
+
+        Args:
+            player_index: The index corresponding to the defending player, 0 for you 1 for the enemy
+
+        Returns:
+            An array indexed by x * ARENA_SIZE + y holding the summed damage per frame of every enemy structure
+            that can attack a mobile unit at that location. This assumes every structure targets the unit.
+            The structures are read from the map's structure arrays, without building their GameUnits.
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+
+        size = self.ARENA_SIZE
+        game_map = self.game_map
+        unit_information = self.config["unitInformation"]
+        threat = array('d', [0.0]) * (size * size)
+        # The offsets to the locations within each attack range
+        ranges = {}
+        for index, type_index in enumerate(game_map.structure_type):
+            if type_index < 0 or game_map.structure_owner[index] == player_index:
+                continue
+            type_config = unit_information[type_index]
+            damage = type_config.get("attackDamageWalker", 0)
+            attack_range = type_config.get("attackRange", 0)
+            if game_map.structure_upgraded[index]:
+                damage = type_config.get("upgrade", {}).get("attackDamageWalker", damage)
+                attack_range = type_config.get("upgrade", {}).get("attackRange", attack_range)
+            if damage <= 0:
+                continue
+            offsets = ranges.get(attack_range)
+            if offsets is None:
+                reach = int(attack_range)
+                offsets = ranges[attack_range] = [(i, j) for i in range(-reach, reach + 1) for j in range(-reach, reach + 1)
+                    if math.sqrt(i * i + j * j) <= attack_range]
+            x, y = index // size, index % size
+            for i, j in offsets:
+                target_x, target_y = x + i, y + j
+                if 0 <= target_x < size and 0 <= target_y < size and IN_ARENA[target_x][target_y]:
+                    threat[target_x * size + target_y] += damage
+        return threat
+
+    def unit_speed(self, unit_type, upgraded=False):
+        """Gets the speed of a mobile unit type
+
+        Args:
+            unit_type: The type of the mobile unit
+            upgraded: Use the speed of the upgraded unit, if the config upgrades it
+
+        Returns:
+            The number of locations the unit moves per frame
+
+        """
+        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
+        speed = type_config.get("speed", 0)
+        if upgraded:
+            speed = type_config.get("upgrade", {}).get("speed", speed)
+        return speed
+
+    def path_timeline(self, path, unit_type, upgraded=False):
+        """Gets the frame a mobile unit would arrive at each location of a path.
+        The unit moves once every 1 / speed frames, so it stays on path[i] from frame timeline[i] until frame timeline[i + 1].
+
+        Args:
+            path: A list of locations, such as one returned by find_path_to_edge
+            unit_type: The type of the mobile unit following the path
+            upgraded: If the unit is upgraded, and moves at its upgraded speed
+
+        Returns:
+            An array with the arrival frame of each location in path, counted from the frame the unit spawns on path[0]
+
+        """
+        if unit_type not in ALL_UNITS or is_stationary(unit_type):
+            self._invalid_unit(unit_type)
+            return
+
+        frames_per_move = 1 / self.unit_speed(unit_type, upgraded)
+        if frames_per_move == int(frames_per_move):
+            frames_per_move = int(frames_per_move)
+            return array('i', range(0, len(path) * frames_per_move, frames_per_move))
+        return array('i', [math.ceil(round(move * frames_per_move, 6)) for move in range(len(path))])
+
+    def path_damage(self, path, unit_type, threat_map=None, player_index=0, upgraded=False):
+        """Estimates the damage a mobile unit would take from enemy structures while following a path.
+        A unit spends 1 / speed frames on each location, so slower units take more damage on the same path.
+
+        Args:
+            path: A list of locations, such as one returned by find_path_to_edge
+            unit_type: The type of the mobile unit following the path
+            threat_map: The result of threat_map(player_index). Computed if None.
+            player_index: The index corresponding to the player controlling the unit, 0 for you 1 for the enemy
+            upgraded: If the unit is upgraded, and moves at its upgraded speed
+
+        Returns:
+            The total damage the unit would take, assuming every structure in range targets it
+
+        """
+        if unit_type not in ALL_UNITS or is_stationary(unit_type):
+            self._invalid_unit(unit_type)
+            return
+        if threat_map is None:
+            threat_map = self.threat_map(player_index)
+
+        size = self.ARENA_SIZE
+        speed = self.unit_speed(unit_type, upgraded)
+        return sum(threat_map[x * size + y] for x, y in path) / speed
+
+
+class Transaction:
+    """Undoes the changes made to a GameState inside a with statement, see GameState.transaction
+
+    Changes to the map are undone in O(changes) from the map's undo log.
+    Resources are restored and the builds and deploys added since the start are dropped.
+
+    Attributes :
+        * game_state (:obj: GameState): The game state being recorded
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+
+    def __enter__(self):
+        state = self.game_state
+        self._resources = [dict(resources) for resources in state._player_resources]
+        self._build_length = len(state._build_stack)
+        self._deploy_length = len(state._deploy_stack)
+        self._checkpoint = state.game_map._begin_undo()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.rollback()
+        self.game_state.game_map._end_undo()
+        return False
+
+    def rollback(self):
+        """Undoes every change made since the transaction started. The transaction keeps recording afterwards.
+        """
+        state = self.game_state
+        state.game_map._rollback(self._checkpoint)
+        state._player_resources = [dict(resources) for resources in self._resources]
+        del state._build_stack[self._build_length:]
+        del state._deploy_stack[self._deploy_length:]
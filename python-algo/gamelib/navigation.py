@@ -1,24 +1,481 @@
 import heapq
 import math
 import sys
-import queue
+import threading
+from array import array
+from collections import OrderedDict, deque, namedtuple
 from .util import debug_write
+from .game_map import GameMap
 
-class Node:
-    """A pathfinding node
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+def _get_direction_from_endpoints(end_points):
+    """Gets the direction of a set of endpoints
+
+    Args:
+        * end_points: A set of endpoints, should be an edge 
+
+    Returns:
+        A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+
+    """
+    point = end_points[0]
+    x, y = point
+    direction = [1, 1]
+    if x < HALF_ARENA:
+       direction[0] = -1
+    if y < HALF_ARENA:
+        direction[1] = -1
+    return direction
+
+def _build_endpoint_table(end_points):
+    """Builds the lookup tables used to search towards a set of endpoints
+
+    The idealness of a tile tells how much a unit wants to path to it.
+    Better self destruct locations are more ideal. The endpoints are perfectly ideal.
+
+    Returns:
+        A tuple (idealness, end_point_mask, direction). idealness and end_point_mask are indexed by x * ARENA_SIZE + y.
+
+    """
+    direction = _get_direction_from_endpoints(end_points)
+    end_point_mask = bytearray(ARENA_SIZE * ARENA_SIZE)
+    for x, y in end_points:
+        end_point_mask[x * ARENA_SIZE + y] = 1
+
+    idealness = []
+    for x in range(ARENA_SIZE):
+        for y in range(ARENA_SIZE):
+            if end_point_mask[x * ARENA_SIZE + y]:
+                idealness.append(sys.maxsize)
+                continue
+            tile_idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+            tile_idealness += x if direction[0] == 1 else 27 - x
+            idealness.append(tile_idealness)
+    return tuple(idealness), bytes(end_point_mask), direction
+
+_ENDPOINT_TABLES = {}
+
+def _endpoint_table(end_points):
+    """Gets the lookup tables for a set of endpoints, building them the first time they are used
+    """
+    key = tuple(x * ARENA_SIZE + y for x, y in end_points)
+    table = _ENDPOINT_TABLES.get(key)
+    if table is None:
+        table = _ENDPOINT_TABLES[key] = _build_endpoint_table(end_points)
+    return table
+
+"""
+Lookup tables for the four edges, indexed by the GameMap edge constants (TOP_RIGHT, TOP_LEFT, BOTTOM_LEFT, BOTTOM_RIGHT).
+Each is a tuple (idealness, end_point_mask, direction).
+"""
+EDGE_TABLES = tuple(_endpoint_table(edge) for edge in GameMap(None).get_edges())
+
+def _numpy_distance_fields(arena_mask, blocked_masks, seeds):
+    """Vectorized breadth first search of several boards at once, using NumPy
+
+    Every board is expanded by one wavefront per step, so the cost of a step is shared by all of the boards.
+    Gives the same pathlengths as ShortestPathFinder._validate.
+
+    Args:
+        * arena_mask: 1 for each tile inside the arena, indexed by x * ARENA_SIZE + y
+        * blocked_masks: A list of blocked masks, one per board
+        * seeds: The indices with a pathlength of 0
+
+    Returns:
+        A list with the pathlength array of each board
+
+    """
+    shape = (len(blocked_masks), ARENA_SIZE, ARENA_SIZE)
+    arena = np.frombuffer(arena_mask, np.uint8).reshape(ARENA_SIZE, ARENA_SIZE).astype(bool)
+    blocked = np.frombuffer(b"".join(blocked_masks), np.uint8).reshape(shape).astype(bool)
+    open_tiles = arena & ~blocked
+    seed_mask = np.zeros(ARENA_SIZE * ARENA_SIZE, bool)
+    seed_mask[list(seeds)] = True
+    seed_mask = seed_mask.reshape(ARENA_SIZE, ARENA_SIZE)
+
+    pathlength = np.full(shape, -1, np.intc)
+    pathlength[:, seed_mask] = 0
+    visited = np.broadcast_to(seed_mask, shape).copy()
+    #Blocked seeds keep their pathlength of 0 but do not expand
+    frontier = visited & open_tiles
+    step = np.empty(shape, bool)
+    distance = 0
+    while frontier.any():
+        step[:] = False
+        step[:, :, 1:] |= frontier[:, :, :-1]
+        step[:, :, :-1] |= frontier[:, :, 1:]
+        step[:, 1:, :] |= frontier[:, :-1, :]
+        step[:, :-1, :] |= frontier[:, 1:, :]
+        step &= open_tiles
+        step &= ~visited
+        distance += 1
+        pathlength[step] = distance
+        visited |= step
+        frontier, step = step, frontier
+    return [array('i', board.tobytes()) for board in pathlength]
+
+
+class PathResult(namedtuple("PathResult", ["path", "end_type", "length", "ideal_tile"])):
+    """The path of a unit and how it ends
 
     Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
+        * path (list): The locations the unit moves through, as returned by find_path_to_edge. Shared with the path cache, do not modify it.
+        * end_type (int): PathResult.EDGE if the path ends on the target edge, PathResult.SELF_DESTRUCT otherwise
+        * length (int): The number of moves along the path
+        * ideal_tile (list): The last location of the path, the most ideal tile the unit could reach
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    __slots__ = ()
+    EDGE = 0
+    SELF_DESTRUCT = 1
+
+    @property
+    def reaches_edge(self):
+        return self.end_type == PathResult.EDGE
+
+class DistanceFieldCache:
+    """A least recently used cache of validated distance fields
+
+    A distance field only depends on which tiles are blocked and which tiles it was seeded from,
+    so it can be reused by any later query on the same board, including on later turns.
+    ShortestPathFinder also uses one to cache PathResults.
+    Lookups and stores are locked, because the caches are shared by every thread, see AlgoCore.threaded_frames.
+
+    Attributes :
+        * maxsize (int): The maximum number of distance fields kept. 0 disables caching.
+        * hits (int): The number of lookups that found a distance field
+        * misses (int): The number of lookups that did not find a distance field
+
+    """
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fields = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fields)
+
+    def get(self, key):
+        """Gets the distance field stored under key, marking it as recently used
+
+        Returns:
+            The distance field, or None if it is not cached
+
+        """
+        with self._lock:
+            field = self._fields.get(key)
+            if field is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._fields.move_to_end(key)
+            return field
+
+    def put(self, key, field):
+        """Stores a distance field, evicting the least recently used ones if the cache is full
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._fields[key] = field
+            self._fields.move_to_end(key)
+            while len(self._fields) > self.maxsize:
+                self._fields.popitem(last=False)
+
+    def clear(self):
+        """Removes all distance fields and resets the hit and miss counters
+        """
+        with self._lock:
+            self._fields.clear()
+            self.hits = 0
+            self.misses = 0
+
+class DistanceField:
+    """The pathlength of every tile to a set of endpoints, which can be updated in place
+    when a few tiles become blocked or unblocked.
+
+    Updates only revisit the tiles whose pathlength can change, instead of searching all 420 tiles again,
+    which makes it cheap to try many hypothetical structure placements::
+
+        field = game_state.distance_field(game_state.game_map.TOP_RIGHT)
+        for location in candidates:
+            field.block(location)
+            path = field.get_path([13, 0])
+            field.unblock(location)
+
+    Attributes :
+        * end_points: The end points of the field, usually a list of edge locations
+        * blocked (bytearray): 1 for each tile containing a real or hypothetical structure
+        * pathlength (array): The distance between each tile and the closest unblocked end point, -1 if unreachable.
+          Blocked end points have a pathlength of 0.
+
+    """
+    def __init__(self, path_finder, end_points, blocked, pathlength):
+        self._path_finder = path_finder
+        self._size = path_finder.ARENA_SIZE
+        self._neighbors = path_finder._neighbors
+        self._seeds = frozenset(location[0] * self._size + location[1] for location in end_points)
+        self.end_points = end_points
+        self.blocked = blocked
+        self.pathlength = pathlength
+
+    def _indices(self, locations):
+        if type(locations[0]) == int:
+            locations = [locations]
+        return [location[0] * self._size + location[1] for location in locations]
+
+    def block(self, locations):
+        """Blocks tiles and updates the pathlengths that depend on them
+
+        Args:
+            locations: A location or list of locations that now contain a structure
+
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        neighbors = self._neighbors
+
+        #Invalidate every tile whose shortest paths all ran through a newly blocked tile, in order of pathlength
+        candidates = []
+        for index in self._indices(locations):
+            if blocked[index]:
+                continue
+            blocked[index] = 1
+            old_pathlength = pathlength[index]
+            if index not in self._seeds:
+                pathlength[index] = -1
+            if old_pathlength < 0:
+                continue
+            for neighbor in neighbors[index]:
+                if pathlength[neighbor] == old_pathlength + 1 and not blocked[neighbor]:
+                    heapq.heappush(candidates, (old_pathlength + 1, neighbor))
+
+        invalidated = []
+        while candidates:
+            tile_pathlength, index = heapq.heappop(candidates)
+            if pathlength[index] != tile_pathlength:
+                continue
+            supported = False
+            for neighbor in neighbors[index]:
+                if pathlength[neighbor] == tile_pathlength - 1 and not blocked[neighbor]:
+                    supported = True
+                    break
+            if supported:
+                continue
+            pathlength[index] = -1
+            invalidated.append(index)
+            for neighbor in neighbors[index]:
+                if pathlength[neighbor] == tile_pathlength + 1 and not blocked[neighbor]:
+                    heapq.heappush(candidates, (tile_pathlength + 1, neighbor))
+
+        #Give the invalidated tiles their new pathlength from their still valid neighbors
+        frontier = []
+        for index in invalidated:
+            best = -1
+            for neighbor in neighbors[index]:
+                if pathlength[neighbor] >= 0 and not blocked[neighbor] and (best < 0 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if best >= 0:
+                pathlength[index] = best
+                frontier.append((best, index))
+        self._relax(frontier)
+
+    def unblock(self, locations):
+        """Unblocks tiles and updates the pathlengths that can now be shortened
+
+        Args:
+            locations: A location or list of locations that no longer contain a structure
+
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+
+        frontier = []
+        for index in self._indices(locations):
+            if not blocked[index]:
+                continue
+            blocked[index] = 0
+            if index in self._seeds:
+                frontier.append((0, index))
+                continue
+            best = -1
+            for neighbor in self._neighbors[index]:
+                if pathlength[neighbor] >= 0 and not blocked[neighbor] and (best < 0 or pathlength[neighbor] + 1 < best):
+                    best = pathlength[neighbor] + 1
+            if best >= 0:
+                pathlength[index] = best
+                frontier.append((best, index))
+        self._relax(frontier)
+
+    def _relax(self, frontier):
+        """Propagates shorter pathlengths outwards from the (pathlength, index) pairs in frontier
+        """
+        blocked = self.blocked
+        pathlength = self.pathlength
+        neighbors = self._neighbors
+        heapq.heapify(frontier)
+        while frontier:
+            tile_pathlength, index = heapq.heappop(frontier)
+            if pathlength[index] != tile_pathlength:
+                continue
+            for neighbor in neighbors[index]:
+                if blocked[neighbor]:
+                    continue
+                if pathlength[neighbor] < 0 or pathlength[neighbor] > tile_pathlength + 1:
+                    pathlength[neighbor] = tile_pathlength + 1
+                    heapq.heappush(frontier, (tile_pathlength + 1, neighbor))
+
+    def get_path(self, start_point):
+        """Gets the path a unit at start_point would take with the field's blocked tiles
+
+        Args:
+            start_point: The starting location of the unit
+
+        Returns:
+            The same path ShortestPathFinder would give on a board with these blocked tiles, or None if start_point is blocked
+
+        """
+        path_finder = self._path_finder
+        if not path_finder.game_state.game_map.in_arena_bounds(start_point) or self.blocked[start_point[0] * self._size + start_point[1]]:
+            return None
+        path_finder.blocked[:] = self.blocked
+        return path_finder._path_from(start_point, self.end_points, [self.pathlength], bytes(self.blocked))
+
+class EdgeFields:
+    """The pathlength of every tile to each of the four edges, for one board
+
+    Attributes :
+        * blocked (bytes): 1 for each tile containing a structure
+        * pathlengths (tuple): The pathlength array of each edge, indexed by the GameMap edge constants.
+          They are shared with the distance field cache and must not be modified.
+
+    """
+    def __init__(self, path_finder, edges, blocked, pathlengths):
+        self._path_finder = path_finder
+        self._size = path_finder.ARENA_SIZE
+        self._edges = edges
+        self.blocked = blocked
+        self.pathlengths = pathlengths
+
+    def distance(self, location, edge):
+        """Gets the number of moves between a location and an edge
+
+        Args:
+            location: The location of a hypothetical unit
+            edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            The number of moves, or -1 if the location is blocked or cannot reach the edge
+
+        """
+        index = location[0] * self._size + location[1]
+        if self.blocked[index]:
+            return -1
+        return self.pathlengths[edge][index]
+
+    def get_path(self, start_point, edge):
+        """Gets the path a unit at start_point would take to reach an edge
+
+        Args:
+            start_point: The location of a hypothetical unit
+            edge: The edge the unit wants to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            The same path as GameState.find_path_to_edge, or None if start_point is blocked
+
+        """
+        path_finder = self._path_finder
+        if not path_finder.game_state.game_map.in_arena_bounds(start_point) or self.blocked[start_point[0] * self._size + start_point[1]]:
+            return None
+        path_finder.blocked[:] = self.blocked
+        return path_finder._path_from(start_point, self._edges[edge], [self.pathlengths[edge]], self.blocked)
+
+    def distance_field(self, edge):
+        """Gets a copy of one edge's pathlengths that can be updated with hypothetical structures
+
+        Returns:
+            A DistanceField for the edge
+
+        """
+        return DistanceField(self._path_finder, self._edges[edge], bytearray(self.blocked), array('i', self.pathlengths[edge]))
+
+class PathWalker:
+    """Follows a unit one step at a time through a board that can change while it moves
+
+    The path is only planned again when the structures on the board have changed since the previous step,
+    starting from the unit's current location and keeping its last move direction, like units do in game.
+    On an unchanged board the steps are the same as the path from find_path_to_edge.
+
+    Attributes :
+        * location (list): The current location of the unit
+        * end_points (list): The end points of the unit
+        * replans (int): The number of times the board changed and the path was planned again
+
+    """
+    def __init__(self, path_finder, game_state, start_point, end_points):
+        self._path_finder = path_finder
+        self._game_map = game_state.game_map
+        self._direction = _endpoint_table(end_points)[2]
+        self._blocked_key = None
+        self._fields = None
+        self._move_direction = 0
+        self._started = False
+        self.location = start_point
+        self.end_points = end_points
+        self.replans = -1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Gets the next location of the unit, starting with its start location.
+        Raises StopIteration once the unit reached its target, or if its location became blocked.
+
+        """
+        path_finder = self._path_finder
+        current = self.location
+        size = path_finder.ARENA_SIZE
+        index = current[0] * size + current[1]
+        if self._game_map.blocked_mask[index]:
+            raise StopIteration
+
+        if self._game_map.blocked_mask != self._blocked_key:
+            self._blocked_key = bytes(self._game_map.blocked_mask)
+            path_finder.blocked[:] = self._blocked_key
+            self._fields = [path_finder._distance_field(self._blocked_key, self.end_points)]
+            self.replans += 1
+        else:
+            path_finder.blocked[:] = self._blocked_key
+
+        if not self._started:
+            self._started = True
+            return current
+
+        #Reuse the edge search, or the self destruct search of the unit's pocket
+        pathlength = next((field for field in self._fields if field[index] >= 0), None)
+        if pathlength is None:
+            ideal_tile = path_finder._idealness_search(current, self.end_points)
+            pathlength = path_finder._distance_field(self._blocked_key, [ideal_tile])
+            self._fields.append(pathlength)
+        if pathlength[index] == 0:
+            raise StopIteration
+
+        next_move = path_finder._choose_next_move(current, self._move_direction, self._direction, pathlength)
+        if current[0] == next_move[0]:
+            self._move_direction = path_finder.VERTICAL
+        else:
+            self._move_direction = path_finder.HORIZONTAL
+        self.location = next_move
+        return next_move
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +485,57 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The grid is stored in flat, preallocated buffers indexed by ``x * ARENA_SIZE + y``.
+    The buffers are reset between calls instead of being reallocated.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
+        * blocked (bytearray): 1 for each tile containing a structure
+        * visited_idealness (bytearray): 1 for each tile visited during the idealness search step
+        * visited_validate (bytearray): 1 for each tile visited during the validation step
+        * pathlength (array): The distance between each tile and the target location, -1 if unreached
+        * field_cache (:obj: DistanceFieldCache): Validated distance fields keyed by blocked tiles and seeds, shared by all finders
+        * path_cache (:obj: DistanceFieldCache): PathResults keyed by blocked tiles, start point and end points, shared by all finders
+        * use_numpy (bool): Use the vectorized NumPy search for large batches of boards. True when NumPy can be imported.
+        * numpy_min_boards (int): The smallest batch of boards searched with NumPy. Smaller batches,
+          including single queries, are faster with the breadth first search on a 28x28 board.
 
     """
+    ARENA_SIZE = 28
+    field_cache = DistanceFieldCache()
+    path_cache = DistanceFieldCache(1024)
+    use_numpy = np is not None
+    numpy_min_boards = 16
+    _neighbors = None
+    _arena_mask = None
+
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        tiles = self.ARENA_SIZE * self.ARENA_SIZE
+        self._zeros = bytes(tiles)
+        self._unreached = array('i', [-1]) * tiles
+        self.blocked = bytearray(tiles)
+        self.visited_idealness = bytearray(tiles)
+        self.visited_validate = bytearray(tiles)
+        self.pathlength = array('i', self._unreached)
+
+    @classmethod
+    def _build_neighbors(cls, game_map):
+        """Builds the in-arena neighbors of every tile, in the order [up, down, right, left]
+        """
+        size = cls.ARENA_SIZE
+        neighbors = []
+        for x in range(size):
+            for y in range(size):
+                neighbors.append(tuple(nx * size + ny for nx, ny in [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+                                       if game_map.in_arena_bounds([nx, ny])))
+        cls._neighbors = tuple(neighbors)
+        cls._arena_mask = bytes(game_map.in_arena_bounds([x, y]) for x in range(size) for y in range(size))
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -50,7 +546,12 @@ class ShortestPathFinder:
         #Initialize map 
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
+        if ShortestPathFinder._neighbors is None:
+            self._build_neighbors(game_state.game_map)
+        self.blocked[:] = self._zeros
+        self.visited_idealness[:] = self._zeros
+        self.visited_validate[:] = self._zeros
+        self.pathlength[:] = self._unreached
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
@@ -67,145 +568,300 @@ class ShortestPathFinder:
         """
         if game_state.contains_stationary_unit(start_point):
             return
+        return self.navigate_batch([start_point], end_points, game_state)[0]
+
+    def navigate_result(self, start_point, end_points, game_state):
+        """Finds the path a unit would take to reach a set of endpoints, and whether it reaches them
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The current game state
 
+        Returns:
+            A PathResult, from path_cache if the same query was made on the same board.
+            None if start_point is blocked or out of bounds.
+
+        """
+        size = self.ARENA_SIZE
+        blocked_mask = game_state.game_map.blocked_mask
+        if not game_state.game_map.in_arena_bounds(start_point) or blocked_mask[start_point[0] * size + start_point[1]]:
+            return None
+
+        key = (bytes(blocked_mask), start_point[0] * size + start_point[1], tuple(location[0] * size + location[1] for location in end_points))
+        result = self.path_cache.get(key)
+        if result is None:
+            path = self.navigate_batch([start_point], end_points, game_state)[0]
+            ideal_tile = path[-1]
+            end_type = PathResult.EDGE if _endpoint_table(end_points)[1][ideal_tile[0] * size + ideal_tile[1]] else PathResult.SELF_DESTRUCT
+            result = PathResult(path, end_type, len(path) - 1, ideal_tile)
+            self.path_cache.put(key, result)
+        return result
+
+    def navigate_batch(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
+
+        The validation search seeded from end_points does not depend on the start point, so it is done once
+        and shared by every start point that can reach the endpoints. Start points that cannot reach them
+        share one self destruct search per pocket of pathable space.
+
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A list containing the path for each start point, in the same order as start_points.
+            The entry is None for start points that are blocked or out of bounds.
+
+        """
         #Initialize map 
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self.blocked[:] = game_state.game_map.blocked_mask
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        size = self.ARENA_SIZE
+        blocked_key = bytes(self.blocked)
+        fields = [self._distance_field(blocked_key, end_points)]
+        paths = []
+        for start_point in start_points:
+            if not game_state.game_map.in_arena_bounds(start_point) or self.blocked[start_point[0] * size + start_point[1]]:
+                paths.append(None)
+                continue
+
+            paths.append(self._path_from(start_point, end_points, fields, blocked_key))
+        return paths
+
+    def distance_field(self, end_points, game_state):
+        """Gets a DistanceField to a set of endpoints for the current game state
+
+        Args:
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
+
+        Returns:
+            A DistanceField that can be updated with hypothetical structure placements and removals
 
-    def _idealness_search(self, start, end_points):
-        """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
-        The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
-
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        self.initialize_map(game_state)
+        self.blocked[:] = game_state.game_map.blocked_mask
+        pathlength = self._distance_field(bytes(self.blocked), end_points)
+        return DistanceField(self, end_points, bytearray(self.blocked), array('i', pathlength))
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+    def edge_fields(self, game_state):
+        """Gets the pathlengths of every tile to all four edges of the current board in one call
 
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
+        The blocked tiles are read once and the four searches share the finder's buffers and the distance field cache.
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+        Args:
+            * game_state: The current game state
 
-        return most_ideal
+        Returns:
+            An EdgeFields that can be queried for any start tile and edge
 
-    def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
         """
-        x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
+        self.initialize_map(game_state)
+        self.blocked[:] = game_state.game_map.blocked_mask
+        blocked_key = bytes(self.blocked)
+        edges = game_state.game_map.get_edges()
+        pathlengths = tuple(self._distance_field(blocked_key, end_points) for end_points in edges)
+        return EdgeFields(self, edges, blocked_key, pathlengths)
 
-    def _get_direction_from_endpoints(self, end_points):
-        """Prints a message to the games debug output
+    def walk(self, start_point, end_points, game_state):
+        """Follows a unit through the board of game_state, one step at a time
 
         Args:
-            * end_points: A set of endpoints, should be an edge 
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit, should be a list of edge locations
+            * game_state: The game state whose game_map will be changed while the unit moves
 
         Returns:
-            A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+            A PathWalker yielding the locations of the unit
+
+        """
+        self.initialize_map(game_state)
+        return PathWalker(self, game_state, start_point, end_points)
+
+    def distance_fields(self, end_points, blocked_masks, game_state):
+        """Gets a DistanceField to a set of endpoints for each of several hypothetical boards
+
+        Boards that are not cached are searched together with NumPy when use_numpy is set and there are
+        at least numpy_min_boards of them, and one by one otherwise. Both give the same pathlengths.
+
+        Args:
+            * end_points: The end points of the units, should be a list of edge locations
+            * blocked_masks: A list of blocked masks, see GameMap.blocked_mask
+            * game_state: The current game state
+
+        Returns:
+            A list with a DistanceField for each blocked mask, in the same order
+
+        """
+        self.initialize_map(game_state)
+        size = self.ARENA_SIZE
+        seeds = tuple(location[0] * size + location[1] for location in end_points)
+        keys = [(bytes(blocked_mask), seeds) for blocked_mask in blocked_masks]
+        pathlengths = [self.field_cache.get(key) for key in keys]
+        missing = [index for index, pathlength in enumerate(pathlengths) if pathlength is None]
+
+        if self.use_numpy and np is not None and len(missing) >= self.numpy_min_boards:
+            searched = _numpy_distance_fields(self._arena_mask, [keys[index][0] for index in missing], seeds)
+        else:
+            searched = []
+            for index in missing:
+                self.blocked[:] = keys[index][0]
+                self._validate(end_points)
+                searched.append(array('i', self.pathlength))
+        for index, pathlength in zip(missing, searched):
+            pathlengths[index] = pathlength
+            self.field_cache.put(keys[index], pathlength)
+
+        return [DistanceField(self, end_points, bytearray(key[0]), array('i', pathlength)) for key, pathlength in zip(keys, pathlengths)]
+
+    def _path_from(self, start_point, end_points, fields, blocked_key):
+        """Gets the path from an unblocked start point using the blocked buffer
+
+        Args:
+            * start_point: The starting location of the unit
+            * end_points: The end points of the unit
+            * fields: Distance fields to try, the first one reaching start_point is used.
+              If none does, the self destruct field of start_point's pocket is appended to it.
+            * blocked_key: The blocked buffer as bytes
 
         """
-        point = end_points[0]
-        x, y = point
-        direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
-           direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
-            direction[1] = -1
-        return direction
-
-    def _get_idealness(self, location, end_points):
-        """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        #Reuse the edge search, or the self destruct search of a start point in the same pocket
+        start_index = start_point[0] * self.ARENA_SIZE + start_point[1]
+        pathlength = next((field for field in fields if field[start_index] >= 0), None)
+        if pathlength is None:
+            ideal_tile = self._idealness_search(start_point, end_points)
+            pathlength = self._distance_field(blocked_key, [ideal_tile])
+            fields.append(pathlength)
+        return self._get_path(start_point, end_points, pathlength)
+
+    def _distance_field(self, blocked_key, seeds):
+        """Gets the validated pathlengths for the current blocked tiles and seeds, from field_cache if possible
+
+        Args:
+            * blocked_key: The blocked buffer as bytes
+            * seeds: The locations with a pathlength of 0
 
         Returns:
-            A location the unit will attempt to reach
+            The pathlength of every tile. It is shared with the cache and must not be modified.
+
         """
-        if location in end_points:
-            return sys.maxsize
+        size = self.ARENA_SIZE
+        key = (blocked_key, tuple(location[0] * size + location[1] for location in seeds))
+        pathlength = self.field_cache.get(key)
+        if pathlength is None:
+            self._validate(seeds)
+            pathlength = array('i', self.pathlength)
+            self.field_cache.put(key, pathlength)
+        else:
+            self.pathlength[:] = pathlength
+        return pathlength
 
-        direction = self._get_direction_from_endpoints(end_points)
+    def _idealness_search(self, start, end_points):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space. 
+        The edge if it is available, or the best self destruct location otherwise
+        """
+        size = self.ARENA_SIZE
+        blocked = self.blocked
+        visited = self.visited_idealness
+        neighbors = self._neighbors
+        visited[:] = self._zeros
+
+        idealness = _endpoint_table(end_points)[0]
+
+        #When searching the game map's own board, the pocket is already known from its regions.
+        #Without reachable endpoints, the most ideal tile is unique and does not depend on the search order.
+        game_map = self.game_state.game_map
+        if blocked == game_map.blocked_mask:
+            most_ideal = max(game_map.region_indices(start), key=idealness.__getitem__)
+            if idealness[most_ideal] != sys.maxsize:
+                return [most_ideal // size, most_ideal % size]
+
+        current = deque()
+        start_index = start[0] * size + start[1]
+        current.append(start_index)
+        best_idealness = idealness[start_index]
+        visited[start_index] = 1
+        most_ideal = start_index
+
+        while current:
+            search_index = current.popleft()
+            for neighbor in neighbors[search_index]:
+                if blocked[neighbor] or visited[neighbor]:
+                    continue
+
+                if idealness[neighbor] > best_idealness:
+                    best_idealness = idealness[neighbor]
+                    most_ideal = neighbor
 
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
+                visited[neighbor] = 1
+                current.append(neighbor)
 
-        return idealness
+        return [most_ideal // size, most_ideal % size]
 
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, seeds):
         """Breadth first search of the grid, setting the pathlengths of each node
 
+        Args:
+            * seeds: The locations with a pathlength of 0. The endpoints if they are reachable, or the most ideal tile otherwise.
+
         """
+        size = self.ARENA_SIZE
+        blocked = self.blocked
+        visited = self.visited_validate
+        pathlength = self.pathlength
+        neighbors = self._neighbors
+        visited[:] = self._zeros
+        pathlength[:] = self._unreached
+
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
-        else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+        current = deque()
+        for location in seeds:
+            index = location[0] * size + location[1]
+            current.append(index)
+            #Set current pathlength to 0
+            pathlength[index] = 0
+            visited[index] = 1
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while current:
+            current_index = current.popleft()
+            if blocked[current_index]:
+                continue
+            next_pathlength = pathlength[current_index] + 1
+            for neighbor in neighbors[current_index]:
+                if blocked[neighbor] or visited[neighbor]:
                     continue
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                visited[neighbor] = 1
+                current.append(neighbor)
 
         #debug_write("Print after validate")
         #self.print_map()
         return
 
-    def _get_path(self, start_point, end_points):
+    def _get_path(self, start_point, end_points, pathlength):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
+        size = self.ARENA_SIZE
+
+        direction = _endpoint_table(end_points)[2]
+
         #GET THE PATH
         path = [start_point]
         current = start_point
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
+        while not pathlength[current[0] * size + current[1]] == 0:
+            #debug_write("current tile {} has cost {}".format(current, pathlength[current[0] * size + current[1]]))
+            next_move = self._choose_next_move(current, move_direction, direction, pathlength)
             #debug_write(next_move)
 
             if current[0] == next_move[0]:
@@ -218,22 +874,22 @@ class ShortestPathFinder:
         #debug_write(path)
         return path
   
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+    def _choose_next_move(self, current_point, previous_move_direction, direction, pathlength):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
+        size = self.ARENA_SIZE
+        blocked = self.blocked
+        current_index = current_point[0] * size + current_point[1]
+        #debug_write("Unit at {} previously moved {}".format(current_point, previous_move_direction))
 
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = pathlength[current_index]
+        for neighbor_index in self._neighbors[current_index]:
+            if blocked[neighbor_index]:
                 continue
 
             new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = pathlength[neighbor_index]
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
@@ -243,7 +899,8 @@ class ShortestPathFinder:
                 new_best = True
 
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            neighbor = [neighbor_index // size, neighbor_index % size]
+            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, direction):
                 continue
 
             ideal_neighbor = neighbor
@@ -252,7 +909,7 @@ class ShortestPathFinder:
         #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
         """
@@ -274,7 +931,6 @@ class ShortestPathFinder:
             return True
         
         #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
         if new_tile[1] == prev_best[1]: #If they both moved horizontal...
             if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
                 return True 
@@ -297,11 +953,12 @@ class ShortestPathFinder:
             debug_write("Attempted to print_map before pathfinder initialization. Use 'this_object.initialize_map(game_state)' to initialize the map first")
             return
 
-        for y in range(28):
-            for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+        size = self.ARENA_SIZE
+        for y in range(size):
+            for x in range(size):
+                index = x * size + (size - y - 1)
+                if not self.blocked[index] and not self.pathlength[index] == -1:
+                    self._print_justified(self.pathlength[index])
                 else:
                     sys.stderr.write("   ")
             debug_write("")
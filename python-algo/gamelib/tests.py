@@ -1,7 +1,18 @@
 import unittest
+import copy
+import io
 import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from unittest import mock
+from .action_frame import ActionFrame
+from .algocore import AlgoCore, StateString
 from .game_state import GameState
 from .unit import GameUnit
+from .game_map import ARENA_LOCATIONS, IN_ARENA
+from .navigation import EDGE_TABLES, DistanceFieldCache, PathResult, np
 
 class BasicTests(unittest.TestCase):
 
@@ -192,6 +203,19 @@ class BasicTests(unittest.TestCase):
         state.suppress_warnings(True)
         return state
 
+    def make_walled_map(self, gap=True):
+        game = self.make_turn_0_map()
+        for x in range(8, 20):
+            if x != 10 or not gap:
+                game.game_map.add_unit("FF", [x, 6], 0)
+        return game
+
+    def make_state(self, p1Units=(), p2Units=(), turn_info=(0, 1, -1), events=None):
+        def pad(units):
+            return list(units) + [[] for _ in range(7 - len(units))]
+        return json.dumps({"p1Units": pad(p1Units), "p2Units": pad(p2Units), "turnInfo": list(turn_info),
+            "p1Stats": [30.0, 25.0, 5.0, 0], "p2Stats": [30.0, 25.0, 5.0, 0], "events": events or {}})
+
     def test_basic(self):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
 
@@ -239,6 +263,363 @@ class BasicTests(unittest.TestCase):
         game = self.make_turn_0_map()
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
+        self.assertEqual([[12, 1], [13, 0], [13, 1], [14, 0], [14, 1]],
+            game.game_map.get_locations_in_range([13, 0], 1.5), "Out of bounds locations should be skipped, in x then y order")
+        self.assertEqual(game.game_map.get_locations_in_range([13, 13], 3.5), game.game_map.get_locations_in_range([13.0, 13.0], 3.5), "Float locations should give the same locations")
+
+    def test_pathing(self):
+        game = self.make_walled_map()
+        expected = [[13, 0], [13, 1], [12, 1], [12, 2], [11, 2], [11, 3], [10, 3], [10, 4], [10, 5], [10, 6], [10, 7], [11, 7],
+            [11, 8], [12, 8], [12, 9], [13, 9], [13, 10], [14, 10], [14, 11], [15, 11], [15, 12], [16, 12], [16, 13], [17, 13],
+            [17, 14], [18, 14], [18, 15], [19, 15], [19, 16], [20, 16], [20, 17], [21, 17], [21, 18], [22, 18], [22, 19]]
+        self.assertEqual(expected, game.find_path_to_edge([13, 0]), "Unit should path through the gap in the wall")
+        self.assertEqual(expected, game.find_path_to_edge([13, 0]), "Pathing twice should give the same path")
+        self.assertEqual(None, game.find_path_to_edge([11, 6]), "Pathing from a blocked tile should fail")
+
+        game.game_map.add_unit("FF", [10, 6], 0)
+        self.assertEqual([[13, 0], [13, 1], [14, 1], [14, 2], [15, 2], [15, 3], [16, 3], [16, 4], [17, 4], [17, 5], [18, 5], [19, 5]],
+            game.find_path_to_edge([13, 0]), "Unit should self destruct at the most ideal tile of its pocket")
+
+    def test_batch_pathing(self):
+        game = self.make_walled_map(gap=False)
+        game.game_map.add_unit("FF", [20, 14], 1)
+        starts = [[13, 0], [20, 14], [6, 7], [3, 10], [14, 0], [24, 16], [13, 5]]
+        expected = [game.find_path_to_edge(start) for start in starts]
+        self.assertEqual(expected, game.find_paths_to_edge_batch(starts), "Batch paths should match single paths")
+        self.assertEqual(None, expected[1], "Pathing from a blocked tile should fail")
+
+        expected = [game.find_path_to_edge(start, game.game_map.TOP_LEFT) for start in starts]
+        self.assertEqual(expected, game.find_paths_to_edge_batch(starts, game.game_map.TOP_LEFT), "Batch paths should respect target_edge")
+
+    def test_edge_tables(self):
+        game = self.make_turn_0_map()
+        directions = [[1, 1], [-1, 1], [-1, -1], [1, -1]]
+        for edge, (idealness, end_point_mask, direction) in enumerate(EDGE_TABLES):
+            edge_indices = [x * 28 + y for x, y in game.game_map.get_edge_locations(edge)]
+            self.assertEqual(sorted(edge_indices), [index for index, is_end_point in enumerate(end_point_mask) if is_end_point], "Wrong endpoints for edge {}".format(edge))
+            self.assertEqual(directions[edge], direction, "Wrong direction for edge {}".format(edge))
+            self.assertTrue(all(idealness[index] > idealness[13 * 28 + 13] for index in edge_indices), "Endpoints should be the most ideal tiles")
+        self.assertLess(EDGE_TABLES[0][0][13 * 28 + 13], EDGE_TABLES[0][0][14 * 28 + 13], "Tiles closer to the target edge should be more ideal")
+
+    def test_distance_field_cache(self):
+        game = self.make_turn_0_map()
+        cache = game._shortest_path_finder.field_cache
+        cache.clear()
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual((0, 1), (cache.hits, cache.misses), "The first search should miss the cache")
+        self.assertEqual(path, game.find_path_to_edge([13, 0]), "Cached search should not change the path")
+        self.assertEqual(path, self.make_turn_0_map().find_path_to_edge([13, 0]), "Cached fields should be shared across game states")
+        self.assertEqual((2, 1), (cache.hits, cache.misses), "Searches on the same board should hit the cache")
+
+        game.game_map.add_unit("FF", [13, 10], 0)
+        game.find_path_to_edge([13, 0])
+        self.assertEqual((2, 2), (cache.hits, cache.misses), "Changing the board should miss the cache")
+
+        cache.maxsize = 1
+        game.find_path_to_edge([13, 0], game.game_map.TOP_LEFT)
+        self.assertEqual(1, len(cache), "The cache should evict the least recently used field")
+        cache.maxsize = 128
+
+    def test_distance_field_cache_threads(self):
+        class SlowFields(OrderedDict):
+            def get(self, key, default=None):
+                field = super().get(key, default)
+                # Let the other thread run between the lookup and the move to the end, where it could evict key
+                time.sleep(0)
+                return field
+
+        cache = DistanceFieldCache(4)
+        cache._fields = SlowFields()
+        errors = []
+        def hammer(offset):
+            try:
+                for step in range(2000):
+                    key = (step * (offset + 1)) % 9
+                    if cache.get(key) is None:
+                        cache.put(key, [key])
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=hammer, args=(offset,)) for offset in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors, "The cache should be usable from several threads")
+        self.assertEqual(4000, cache.hits + cache.misses, "Every lookup should be counted")
+        self.assertLessEqual(len(cache), 4, "The cache should not grow past its maxsize")
+
+    def test_distance_field(self):
+        game = self.make_walled_map()
+        field = game.distance_field(game.game_map.TOP_RIGHT)
+        open_path = game.find_path_to_edge([13, 0])
+        open_pathlength = list(field.pathlength)
+        self.assertEqual(open_path, field.get_path([13, 0]), "A fresh field should give the same path")
+
+        field.block([[10, 6], [20, 20]])
+        game.game_map.add_unit("FF", [10, 6], 0)
+        game.game_map.add_unit("FF", [20, 20], 1)
+        expected = self.make_turn_0_map()
+        for location in game.game_map:
+            if game.contains_stationary_unit(location):
+                expected.game_map.add_unit("FF", location, 0)
+        self.assertEqual(list(expected.distance_field(game.game_map.TOP_RIGHT).pathlength), list(field.pathlength), "Blocking should match a full search")
+        self.assertEqual(game.find_path_to_edge([13, 0]), field.get_path([13, 0]), "Blocking should match a full search")
+        self.assertEqual(None, field.get_path([10, 6]), "Pathing from a blocked tile should fail")
+
+        field.unblock([10, 6])
+        field.unblock([[20, 20]])
+        self.assertEqual(open_pathlength, list(field.pathlength), "Unblocking should restore the original pathlengths")
+        self.assertEqual(open_path, field.get_path([13, 0]), "Unblocking should restore the original path")
+
+    def test_path_result(self):
+        game = self.make_walled_map()
+        result = game.find_path_result([13, 0])
+        self.assertEqual(game.find_path_to_edge([13, 0]), result.path, "Result should hold the same path")
+        self.assertEqual(PathResult.EDGE, result.end_type, "Unit should reach its edge")
+        self.assertEqual(len(result.path) - 1, result.length, "Length should count the moves")
+        self.assertEqual([22, 19], result.ideal_tile, "Ideal tile should be the end of the path")
+        self.assertIs(result, game.find_path_result([13, 0]), "Result should be cached")
+
+        game.game_map.add_unit("FF", [10, 6], 0)
+        result = game.find_path_result([13, 0])
+        self.assertEqual(PathResult.SELF_DESTRUCT, result.end_type, "Unit should self destruct")
+        self.assertFalse(result.reaches_edge, "Unit should self destruct")
+        self.assertEqual([19, 5], result.ideal_tile, "Unit should self destruct at the most ideal tile of its pocket")
+        self.assertEqual(None, game.find_path_result([10, 6]), "Pathing from a blocked tile should fail")
+
+    def test_arena_locations(self):
+        game_map = self.make_turn_0_map().game_map
+        locations = list(game_map)
+        self.assertEqual(420, len(locations), "The arena should have 420 locations")
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], locations[:3], "Locations should be iterated row by row")
+        self.assertEqual(locations, [list(location) for location in ARENA_LOCATIONS], "Iteration should follow ARENA_LOCATIONS")
+        self.assertEqual(420 * 420, sum(1 for _ in game_map for _ in game_map), "Nested iteration should not interfere")
+        self.assertEqual(420, sum(map(sum, IN_ARENA)), "IN_ARENA should match the arena locations")
+        self.assertTrue(game_map.in_arena_bounds([13, 0]) and game_map.in_arena_bounds([13.0, 0]), "Locations on the board should be in bounds")
+        self.assertFalse(game_map.in_arena_bounds([0, 0]) or game_map.in_arena_bounds([28, 13]) or game_map.in_arena_bounds([-1, 13]), "Locations off the board should be out of bounds")
+
+    def test_regions(self):
+        game = self.make_walled_map()
+        game_map = game.game_map
+        self.assertEqual(game_map.region([13, 0]), game_map.region([13, 27]), "The gap should connect both sides of the wall")
+        self.assertTrue(game_map.can_reach_edge([13, 0], game_map.TOP_RIGHT), "Unit should reach the edge through the gap")
+        self.assertEqual(-1, game_map.region([11, 6]), "Blocked locations have no region")
+        self.assertFalse(game_map.can_reach_edge([11, 6], game_map.TOP_RIGHT), "Blocked locations cannot reach edges")
+        self.assertEqual(420 - 11, len(game_map.region_indices([13, 0])), "All open locations should be connected")
+
+        game_map.add_unit("FF", [10, 6], 0)
+        self.assertNotEqual(game_map.region([13, 0]), game_map.region([13, 27]), "Closing the gap should split the regions")
+        self.assertFalse(game_map.can_reach_edge([13, 0], game_map.TOP_RIGHT), "Unit should be walled off")
+        self.assertTrue(game_map.can_reach_edge([13, 0], game_map.BOTTOM_RIGHT), "Unit should reach the edges of its pocket")
+        self.assertTrue(game_map.can_reach_edge([3, 10], game_map.TOP_RIGHT), "Units outside of the wall should reach the edge")
+        self.assertEqual([19, 5], game.find_path_to_edge([13, 0])[-1], "Unit should self destruct at the most ideal tile of its pocket")
+
+        game_map.remove_unit([10, 6])
+        self.assertTrue(game_map.can_reach_edge([13, 0], game_map.TOP_RIGHT), "Regions should be labeled again after a change")
+
+    def test_walk_path(self):
+        game = self.make_walled_map(gap=False)
+        walker = game.walk_path([13, 0])
+        self.assertEqual(game.find_path_to_edge([13, 0]), list(walker), "Walking an unchanged board should follow the path")
+        self.assertEqual(0, walker.replans, "An unchanged board should not be planned again")
+
+        walker = game.walk_path([13, 0])
+        walked = [next(walker) for _ in range(5)]
+        self.assertEqual([[13, 0], [13, 1], [14, 1], [14, 2], [15, 2]], walked, "Unit should start on its self destruct path")
+        game.game_map.remove_unit([16, 6])
+        walked += list(walker)
+        self.assertEqual(1, walker.replans, "Destroying a structure should plan the path again once")
+        self.assertIn([16, 6], walked, "Unit should path through the destroyed structure")
+        self.assertIn(walked[-1], game.game_map.get_edge_locations(game.game_map.TOP_RIGHT), "Unit should reach its edge")
+        for previous, location in zip(walked, walked[1:]):
+            self.assertEqual(1, abs(previous[0] - location[0]) + abs(previous[1] - location[1]), "Unit should move one tile per step")
+
+    def test_edge_fields(self):
+        game = self.make_walled_map()
+        game.game_map.add_unit("FF", [15, 20], 1)
+        edge_fields = game.edge_fields()
+        for start in [[13, 0], [20, 14], [6, 7], [3, 10], [15, 20], [13, 27]]:
+            for edge in range(4):
+                self.assertEqual(game.find_path_to_edge(start, edge), edge_fields.get_path(start, edge), "Wrong path from {} to edge {}".format(start, edge))
+        self.assertEqual(0, edge_fields.distance([13, 27], game.game_map.TOP_LEFT), "Edge locations should be 0 moves from their edge")
+        self.assertEqual(27, edge_fields.distance([13, 27], game.game_map.BOTTOM_LEFT), "Wrong distance to the bottom left edge")
+        self.assertEqual(-1, edge_fields.distance([15, 20], game.game_map.BOTTOM_LEFT), "Blocked locations should not have a distance")
+
+        distance = edge_fields.distance([13, 0], game.game_map.TOP_RIGHT)
+        field = edge_fields.distance_field(game.game_map.TOP_RIGHT)
+        field.block([10, 6])
+        self.assertEqual(distance, edge_fields.distance([13, 0], game.game_map.TOP_RIGHT), "Updating a distance field should not change the edge fields")
+
+    def check_layouts(self, use_numpy):
+        game = self.make_walled_map()
+        layouts = [[], [[10, 6]], [[13, 13], [14, 13]], [[x, 8] for x in range(5, 23)], [[0, 13], [1, 12]]]
+
+        game._shortest_path_finder.field_cache.clear()
+        game._shortest_path_finder.use_numpy = use_numpy
+        game._shortest_path_finder.numpy_min_boards = 1
+        fields = game.distance_fields_for_layouts(game.game_map.TOP_RIGHT, layouts)
+        game._shortest_path_finder.field_cache.clear()
+        for layout, field in zip(layouts, fields):
+            expected = self.make_turn_0_map()
+            for location in game.game_map:
+                if game.contains_stationary_unit(location):
+                    expected.game_map.add_unit("FF", location, 0)
+            for location in layout:
+                expected.game_map.add_unit("FF", location, 0)
+            expected_field = expected.distance_field(expected.game_map.TOP_RIGHT)
+            self.assertEqual(list(expected_field.pathlength), list(field.pathlength), "Wrong pathlengths for layout {}".format(layout))
+            self.assertEqual(expected.find_path_to_edge([13, 0]), field.get_path([13, 0]), "Wrong path for layout {}".format(layout))
+
+    def test_layouts(self):
+        self.check_layouts(use_numpy=False)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_layouts_numpy(self):
+        self.check_layouts(use_numpy=True)
+
+    def test_blocked_mask(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        self.assertEqual(0, sum(game_map.blocked_mask), "An empty map should not be blocked anywhere")
+        game_map.add_unit("EI", [13, 13])
+        self.assertEqual(0, game_map.blocked_mask[13 * 28 + 13], "Mobile units should not block")
+        game_map.add_unit("FF", [13, 13])
+        self.assertEqual(1, game_map.blocked_mask[13 * 28 + 13], "Structures should block")
+        game_map.remove_unit([13, 13])
+        self.assertEqual(0, game_map.blocked_mask[13 * 28 + 13], "Removed structures should not block")
+        game.attempt_spawn("DF", [13, 6])
+        self.assertEqual(1, game_map.blocked_mask[13 * 28 + 6], "Spawned structures should block")
+
+        turn = self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"]]], [[[13, 20, 75.0, "1"]]])
+        game = GameState(game.config, turn)
+        self.assertEqual([3 * 28 + 10, 13 * 28 + 20], [index for index, blocked in enumerate(game.game_map.blocked_mask) if blocked], "Parsed structures should block")
+
+    def test_structure_arrays(self):
+        config = self.make_turn_0_map().config
+        turn = self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"]], [], [], [], [[3, 10, 0.0, "5"]]],
+            [[[13, 20, 75.0, "1"]], [], [], [], [], [], [[13, 20, 0.0, "4"]], []])
+        game = GameState(config, turn)
+        game_map = game.game_map
+        self.assertEqual((2, 0, 90.0, 1), (game_map.structure_type[3 * 28 + 10], game_map.structure_owner[3 * 28 + 10],
+            game_map.structure_health[3 * 28 + 10], game_map.structure_upgraded[3 * 28 + 10]), "Turret should be stored in the structure arrays")
+        self.assertEqual(1, game_map.structure_pending_removal[13 * 28 + 20], "Wall should be marked for removal")
+        self.assertEqual(-1, game_map.structure_type[13 * 28], "Mobile units should not be stored as structures")
+
+        turret = game.contains_stationary_unit([3, 10])
+        self.assertEqual(("DF", 0, 90.0, True, 3.5), (turret.unit_type, turret.player_index, turret.health, turret.upgraded, turret.attackRange), "Turret should be built from the arrays")
+        self.assertIs(game_map[3, 10], game_map[3, 10], "The same list should be returned for a location")
+        self.assertTrue(game_map[13, 20][0].pending_removal, "Wall should be marked for removal")
+        self.assertEqual(["PI"], [unit.unit_type for unit in game_map[13, 0]], "Mobile units should be kept at their location")
+
+        game_map.remove_unit([3, 10])
+        self.assertEqual((-1, []), (game_map.structure_type[3 * 28 + 10], game_map[3, 10]), "Removed structures should be cleared")
+        game_map[3, 10] = [turret]
+        self.assertEqual((2, 1), (game_map.structure_type[3 * 28 + 10], game_map.structure_upgraded[3 * 28 + 10]), "Assigned structures should be stored")
+
+    def test_tile_list(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        wall = GameUnit("FF", game.config, 0, None, 13, 1)
+        game_map[13, 1].append(wall)
+        self.assertIs(wall, game.contains_stationary_unit([13, 1]), "Appended structures should be stored")
+        self.assertEqual((1, 1), (game_map.count(0, "FF"), game_map.blocked_mask[13 * 28 + 1]), "Appended structures should be indexed")
+        self.assertNotIn([13, 1], game.find_path_to_edge([13, 0]), "Units should path around appended structures")
+        game_map[13, 0].extend([GameUnit("PI", game.config, 0, None, 13, 0), GameUnit("PI", game.config, 0, None, 13, 0)])
+        del game_map[13, 0][0]
+        self.assertEqual(1, game_map.count(0, "PI"), "Mobile units should be indexed")
+
+        with game.transaction() as tx:
+            game_map[13, 1].remove(wall)
+            self.assertEqual((False, 0), (game.contains_stationary_unit([13, 1]), game_map.count(0, "FF")), "Removed structures should be cleared")
+            tx.rollback()
+        self.assertEqual((1, 1), (game_map.count(0, "FF"), game_map.blocked_mask[13 * 28 + 1]), "Rollback should restore the structure")
+
+        copied = copy.deepcopy(game_map)
+        copied[13, 1].clear()
+        self.assertEqual((0, 1), (copied.count(0, "FF"), game_map.count(0, "FF")), "Changing a copy should not change the original")
+        removed = game_map[13, 1]
+        game_map.remove_unit([13, 1])
+        removed.append(wall)
+        self.assertEqual(0, game_map.blocked_mask[13 * 28 + 1], "Lists the map no longer holds should not change it")
+
+    def test_unit_index(self):
+        config = self.make_turn_0_map().config
+        turn = self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"], [13, 0, 15.0, "4"]]],
+            [[[13, 20, 75.0, "1"], [10, 20, 75.0, "6"]]])
+        game = GameState(config, turn)
+        game_map = game.game_map
+        self.assertEqual([[10, 20], [13, 20]], [[unit.x, unit.y] for unit in game_map.units_of(1, "FF")], "Enemy walls should be indexed")
+        self.assertEqual((2, 1, 2, 0), (game_map.count(1, "FF"), game_map.count(0, "DF"), game_map.count(0, "PI"), game_map.count(1, "DF")), "Wrong number of units")
+
+        game_map.add_unit("DF", [13, 20], 1)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual((1, 1, 3), (game_map.count(1, "FF"), game_map.count(1, "DF"), game_map.count(0, "PI")), "Added units should be indexed")
+        game_map.remove_unit([13, 0])
+        game_map[3, 10] = []
+        self.assertEqual((0, 0, []), (game_map.count(0, "PI"), game_map.count(0, "DF"), game_map.units_of(0, "DF")), "Removed units should not be indexed")
+
+    def test_fork(self):
+        config = self.make_turn_0_map().config
+        turn = self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"]]], [[[13, 20, 75.0, "1"]]])
+        game = GameState(config, turn)
+        game.suppress_warnings(True)
+        turret = game.contains_stationary_unit([3, 10])
+
+        fork = game.fork()
+        self.assertEqual(1, fork.attempt_spawn("DF", [13, 6]), "Fork should be able to spawn")
+        self.assertEqual(1, fork.attempt_upgrade([3, 10]), "Fork should be able to upgrade")
+        fork.game_map.add_unit("PI", [13, 0])
+        fork.game_map.remove_unit([13, 20])
+
+        self.assertFalse(game.contains_stationary_unit([13, 6]), "Spawning in a fork should not change the original map")
+        self.assertFalse(turret.upgraded or game.contains_stationary_unit([3, 10]).upgraded, "Upgrading in a fork should not change the original units")
+        self.assertEqual((1, 1), (len(game.game_map[13, 0]), game.game_map.count(1, "FF")), "Changing a fork should not change the original units")
+        self.assertEqual((25.0, []), (game.get_resource(game.SP), game._build_stack), "Spending in a fork should not change the original resources")
+        self.assertEqual((2, 2, 0), (len(fork.game_map[13, 0]), len(fork._build_stack), fork.game_map.count(1, "FF")), "Fork should keep its changes")
+        self.assertTrue(fork.contains_stationary_unit([3, 10]).upgraded, "Fork should keep its changes")
+
+        game.game_map.add_unit("EI", [13, 0])
+        self.assertEqual(2, len(fork.game_map[13, 0]), "Changing the original should not change a fork")
+
+    def test_fork_held_units(self):
+        game = GameState(self.make_turn_0_map().config, self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"]]]))
+        turret = game.contains_stationary_unit([3, 10])
+        tile = game.game_map[13, 0]
+        fork = game.fork()
+        turret.health = 1
+        tile.append(GameUnit("PI", game.config, 0, None, 13, 0))
+        self.assertEqual((90.0, 1, 1), (fork.contains_stationary_unit([3, 10]).health, len(fork.game_map[13, 0]), fork.game_map.count(0, "PI")),
+            "Units held before forking should not change the fork")
+        self.assertIs(turret, game.contains_stationary_unit([3, 10]), "Units held before forking should stay on the original map")
+        self.assertEqual((1, 2, 2), (game.contains_stationary_unit([3, 10]).health, len(game.game_map[13, 0]), game.game_map.count(0, "PI")),
+            "Units held before forking should still change the original")
+
+    def test_transaction(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [3, 10], 0)
+        with game.transaction() as tx:
+            self.assertEqual(1, game.attempt_spawn("FF", [13, 6]), "Wall should spawn")
+            self.assertEqual(1, game.attempt_upgrade([3, 10]), "Turret should upgrade")
+            with game.transaction() as inner:
+                game.game_map.remove_unit([3, 10])
+                inner.rollback()
+            self.assertTrue(game.contains_stationary_unit([3, 10]).upgraded, "Inner rollback should only undo the inner changes")
+            tx.rollback()
+        self.assertFalse(game.contains_stationary_unit([13, 6]), "Rollback should remove spawned units")
+        self.assertFalse(game.contains_stationary_unit([3, 10]).upgraded, "Rollback should undo upgrades")
+        self.assertEqual((0, [], 1), (game.game_map.blocked_mask[13 * 28 + 6], game._build_stack, game.game_map.count(0, "DF")), "Rollback should restore the map")
+        self.assertEqual(25, game.get_resource(game.SP), "Rollback should restore resources")
+
+        with self.assertRaises(ValueError):
+            with game.transaction():
+                game.attempt_spawn("FF", [13, 6])
+                raise ValueError()
+        self.assertFalse(game.contains_stationary_unit([13, 6]), "Exceptions should roll back the transaction")
+
+        with game.transaction():
+            game.attempt_spawn("FF", [13, 6])
+        self.assertTrue(game.contains_stationary_unit([13, 6]), "Changes should be kept without a rollback")
 
     def _test_get_attackers(self):
         game = self.make_turn_0_map()
@@ -256,6 +637,211 @@ class BasicTests(unittest.TestCase):
         game.game_map.add_unit("DF", [14,14], 1)
         self.assertEqual(3, len(game.get_attackers([13,13], 0)), "We should be in danger from 3 places")
 
+    def test_threat_map(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [12, 14], 1)
+        game.game_map.add_unit("DF", [13, 14], 1)
+        game.game_map.add_unit("DF", [14, 14], 1)
+        game.game_map.add_unit("DF", [10, 10], 0)
+        game.game_map.add_unit("FF", [14, 13], 1)
+        game.game_map.upgrade_structure([13, 14])
+
+        threat_map = game.threat_map(0)
+        self.assertEqual(5 + 15 + 5, threat_map[13 * 28 + 13], "All three turrets should threaten 13, 13")
+        self.assertEqual(15, threat_map[13 * 28 + 11], "Only the upgraded turret should reach 13, 11")
+        self.assertEqual(0, threat_map[10 * 28 + 10], "Friendly turrets should not threaten us")
+        self.assertEqual(5, game.threat_map(1)[10 * 28 + 9], "Our turret should threaten the enemy")
+
+        path = [[13, 11], [13, 12], [13, 13]]
+        self.assertEqual(15 + 25 + 25, game.path_damage(path, "PI", threat_map), "Speed 1 units spend one frame per location")
+        self.assertEqual(4 * (15 + 25 + 25), game.path_damage(path, "SI"), "Speed 0.25 units spend four frames per location")
+
+    def test_path_timeline(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [20, 10], 1)
+        path = game.find_path_to_edge([13, 0])
+        self.assertEqual(list(range(len(path))), list(game.path_timeline(path, "PI")), "Fast units should move every frame")
+        self.assertEqual([0, 4, 8, 12], list(game.path_timeline(path[:4], "SI")), "Slow units should move every 4 frames")
+
+        game.config["unitInformation"][5]["upgrade"] = {"speed": 0.3}
+        self.assertEqual([0, 4, 8, 12], list(game.path_timeline(path[:4], "SI")), "Units should not be upgraded by default")
+        self.assertEqual([0, 4, 7, 10, 14], list(game.path_timeline(path[:5], "SI", True)), "Upgraded units should move at their upgraded speed")
+        self.assertLess(0, game.path_damage(path, "SI", upgraded=True), "Unit should pass by the turret")
+        self.assertAlmostEqual(game.path_damage(path, "SI") * 0.25 / 0.3, game.path_damage(path, "SI", upgraded=True), msg="Upgraded units should take less damage")
+        self.assertEqual(None, game.path_timeline(path, "FF"), "Structures do not have a timeline")
+
+    def test_single_parse_dispatch(self):
+        config = self.make_turn_0_map().config
+        turn = self.make_state([[], [], [[3, 10, 90.0, "2"]]])
+        frame = self.make_state(turn_info=[1, 1, 3], events={"breach": [[[13, 0], 1, "3", "4", 2]]})
+        end = """{"turnInfo":[2,1,-1]}"""
+
+        class RecordingAlgo(AlgoCore):
+            def on_turn(algo, turn_state):
+                algo.turns.append(GameState(algo.config, turn_state))
+            def on_action_frame(algo, frame_state):
+                algo.frames.append(frame_state)
+
+        algo = RecordingAlgo()
+        algo.turns, algo.frames = [], []
+        stdin = io.StringIO("\n".join([json.dumps(config), turn, frame, end]) + "\n")
+        with mock.patch.object(sys, "stdin", stdin), mock.patch.object(sys, "stderr", io.StringIO()), \
+                mock.patch.object(json, "loads", wraps=json.loads) as loads:
+            algo.start()
+        self.assertEqual(4, loads.call_count, "Each message should be decoded once")
+        self.assertTrue(algo.turns[0].contains_stationary_unit([3, 10]), "GameState should be built from the decoded turn")
+        self.assertEqual(frame + "\n", algo.frames[0], "Handlers should still get the message string")
+        self.assertEqual([[13, 0], 1, "3", "4", 2], algo.frames[0].state["events"]["breach"][0], "Handlers should get the decoded frame")
+
+    def run_frames(self, frame_interval, frame_events):
+        config = self.make_turn_0_map().config
+        frames = [self.make_state(turn_info=[1, 1, number], events={"breach": [[[13, 0], 1, "3", "4", 2]] if number == 3 else [], "death": []})
+            for number in range(6)]
+        class RecordingAlgo(AlgoCore):
+            def on_action_frame(algo, frame_state):
+                algo.frames.append(frame_state.state["turnInfo"][2])
+
+        algo = RecordingAlgo()
+        algo.frames = []
+        algo.frame_interval = frame_interval
+        algo.frame_events = frame_events
+        stdin = io.StringIO("\n".join([json.dumps(config)] + frames + ["""{"turnInfo":[2,1,-1]}"""]) + "\n")
+        with mock.patch.object(sys, "stdin", stdin), mock.patch.object(sys, "stderr", io.StringIO()), \
+                mock.patch.object(json, "loads", wraps=json.loads) as loads:
+            algo.start()
+        return algo.frames, loads.call_count - 2
+
+    def test_frame_filter(self):
+        self.assertEqual(([0, 1, 2, 3, 4, 5], 6), self.run_frames(None, None), "Every frame should be handled by default")
+        self.assertEqual(([3], 1), self.run_frames(None, ["breach"]), "Only frames with breaches should be decoded")
+        self.assertEqual(([], 0), self.run_frames(None, ["death"]), "Frames without deaths should be dropped")
+        self.assertEqual(([0, 2, 3, 4], 4), self.run_frames(2, ["breach"]), "Every other frame and breaches should be handled")
+
+    def test_threaded_frames(self):
+        config = self.make_turn_0_map().config
+        class SlowFrameAlgo(AlgoCore):
+            def on_turn(algo, turn_state):
+                algo.events.append("turn")
+
+            def on_action_frame(algo, frame_state):
+                time.sleep(0.05)
+                algo.events.append(frame_state.state["turnInfo"][2])
+
+        algo = SlowFrameAlgo()
+        algo.events = []
+        algo.threaded_frames = True
+        algo.frame_queue_size = 2
+        messages = [json.dumps(config)] + [self.make_state(turn_info=[1, 1, number]) for number in range(8)] + \
+            [self.make_state(turn_info=[0, 2, -1]), """{"turnInfo":[2,2,-1]}"""]
+        stdin = io.StringIO("\n".join(messages) + "\n")
+        with mock.patch.object(sys, "stdin", stdin), mock.patch.object(sys, "stderr", io.StringIO()):
+            algo.start()
+        self.assertEqual("turn", algo.events[0], "The turn should not wait for slow frames")
+        self.assertGreater(algo.dropped_frames, 0, "Frames should be dropped once the queue is full")
+        self.assertEqual(8, algo.dropped_frames + len(algo.events) - 1, "Every frame should be handled or dropped")
+
+    def test_threaded_frames_wait_for_config(self):
+        config = self.make_turn_0_map().config
+        class SetupAlgo(AlgoCore):
+            def on_game_start(algo, config):
+                time.sleep(0.05)
+                algo.frames = []
+
+            def on_action_frame(algo, frame_state):
+                algo.frames.append(frame_state.state["turnInfo"][2])
+
+        algo = SetupAlgo()
+        algo.threaded_frames = True
+        messages = [json.dumps(config)] + [self.make_state(turn_info=[1, 0, number]) for number in range(3)] + ["""{"turnInfo":[2,0,-1]}"""]
+        stderr = io.StringIO()
+        with mock.patch.object(sys, "stdin", io.StringIO("\n".join(messages) + "\n")), mock.patch.object(sys, "stderr", stderr):
+            algo.start()
+        self.assertEqual([0, 1, 2], algo.frames, "Frames should be handled after on_game_start")
+        self.assertNotIn("Traceback", stderr.getvalue(), "Frames should not be handled before on_game_start")
+
+    def test_on_idle(self):
+        config = self.make_turn_0_map().config
+        class IdleAlgo(AlgoCore):
+            def on_turn(algo, turn_state):
+                algo.events.append(("turn", algo.idle_result))
+
+            def on_idle(algo, turn_state):
+                turn_number = turn_state.state["turnInfo"][1]
+                try:
+                    for step in range(4 if turn_number == 1 else 10):
+                        yield turn_number * 10 + step
+                    return "done"
+                finally:
+                    algo.events.append(("closed", turn_number))
+
+        algo = IdleAlgo()
+        algo.events = []
+        messages = [json.dumps(config), self.make_state(turn_info=[0, 1, -1])] + [self.make_state(turn_info=[1, 1, number]) for number in range(6)] + \
+            [self.make_state(turn_info=[0, 2, -1])] + [self.make_state(turn_info=[1, 2, number]) for number in range(3)] + \
+            [self.make_state(turn_info=[0, 3, -1]), """{"turnInfo":[2,3,-1]}"""]
+        with mock.patch.object(sys, "stdin", io.StringIO("\n".join(messages) + "\n")), mock.patch.object(sys, "stderr", io.StringIO()):
+            algo.start()
+        self.assertEqual([("turn", None), ("closed", 1), ("turn", "done"), ("closed", 2), ("turn", 22)], algo.events,
+                         "The precomputation should run during frames, hand its result to the next turn and be cancelled by it")
+
+        algo.events = []
+        with mock.patch.object(sys, "stdin", io.StringIO("\n".join(messages) + "\n")), mock.patch.object(sys, "stderr", io.StringIO()), \
+                mock.patch(AlgoCore.__module__ + "._input_waiting", return_value=True):
+            algo.start()
+        self.assertEqual([("turn", None), ("turn", None), ("turn", None)], algo.events, "Steps should be skipped while the next message is waiting")
+
+    def test_threaded_on_idle(self):
+        config = self.make_turn_0_map().config
+        idle_done = threading.Event()
+        class GatedInput:
+            # Holds the next turn back until the precomputation is done, or for 2 seconds
+            def __init__(self, messages, gate):
+                self.messages, self.gate = list(messages), gate
+
+            def readline(self):
+                if len(self.messages) == self.gate:
+                    idle_done.wait(2)
+                return self.messages.pop(0) + "\n" if self.messages else ""
+
+        class IdleAlgo(AlgoCore):
+            def on_turn(algo, turn_state):
+                algo.results.append(algo.idle_result)
+
+            def on_idle(algo, turn_state):
+                try:
+                    yield 1
+                    yield 2
+                    return "done"
+                finally:
+                    idle_done.set()
+
+        algo = IdleAlgo()
+        algo.results = []
+        algo.threaded_frames = True
+        algo.frame_events = ["breach"]
+        messages = [json.dumps(config), self.make_state(turn_info=[0, 1, -1])] + \
+            [self.make_state(turn_info=[1, 1, number], events={"breach": []}) for number in range(3)] + \
+            [self.make_state(turn_info=[0, 2, -1]), """{"turnInfo":[2,2,-1]}"""]
+        with mock.patch.object(sys, "stdin", GatedInput(messages, 2)), mock.patch.object(sys, "stderr", io.StringIO()):
+            algo.start()
+        self.assertEqual([None, "done"], algo.results, "The worker should step the precomputation while frames are dropped")
+
+    def test_action_frame(self):
+        config = self.make_turn_0_map().config
+        message = self.make_state([[], [], [[3, 10, 90.0, "2"]], [[13, 0, 15.0, "3"]], [], [], [], [[3, 10, 0.0, "4"]]],
+            [[[13, 20, 75.0, "1"]], [], [], [], [], [], [[13, 20, 0.0, "5"]]], [1, 4, 12], {"breach": [[[13, 0], 1, "3", "4", 2]], "death": []})
+        frame = ActionFrame(message, config)
+        self.assertEqual((4, 12, 25.0), (frame.turn_number, frame.frame_number, frame.p2_stats[1]), "Wrong frame summary")
+        self.assertEqual([13, 0], frame.events["breach"][0][0], "Wrong breach location")
+        self.assertEqual([None, None], frame._units, "Units should not be built before they are accessed")
+
+        self.assertEqual([("DF", 0, 90.0, True), ("PI", 0, 15.0, False)], [(unit.unit_type, unit.player_index, unit.health, unit.upgraded) for unit in frame.p1_units], "Wrong units for player 1")
+        self.assertIs(frame.p1_units, frame.p1_units, "Units should only be built once")
+        self.assertTrue(frame.p2_units[0].pending_removal, "Wall should be marked for removal")
+
+        decoded = StateString(message, json.loads(message))
+        self.assertEqual(frame.events, ActionFrame(decoded, config).events, "Decoded frames should give the same view")
+
     def test_print_unit(self):
         game = self.make_turn_0_map()
 
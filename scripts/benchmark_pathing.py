@@ -0,0 +1,87 @@
+import json
+import os
+import queue
+import sys
+import time
+from collections import deque
+
+# Times the pathfinding of the python-algo gamelib, outside of its unit tests.
+# Usage: python3 scripts/benchmark_pathing.py [rounds]
+
+file_dir = os.path.dirname(os.path.realpath(__file__))
+parent_dir = os.path.abspath(os.path.join(file_dir, os.pardir))
+sys.path.insert(0, os.path.join(parent_dir, "python-algo"))
+
+import gamelib
+
+TURN_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{}}"""
+
+def make_board():
+    """A board with two rows of walls with gaps, like a mid game defense
+    """
+    with open(os.path.join(parent_dir, "game-configs.json")) as config_file:
+        config = json.load(config_file)
+    game_state = gamelib.GameState(config, TURN_0)
+    game_state.suppress_warnings(True)
+    for x in range(3, 25):
+        if x % 5:
+            game_state.game_map.add_unit("FF", [x, 11], 0)
+            game_state.game_map.add_unit("FF", [x, 16], 1)
+    return game_state
+
+def breadth_first_search(neighbors, blocked, seeds, frontier_type):
+    """The breadth first search ShortestPathFinder uses to validate its distance fields, with a given frontier type
+    """
+    pathlength = [-1] * len(blocked)
+    current = frontier_type()
+    if frontier_type is queue.Queue:
+        put, get, size = current.put, current.get, current.qsize
+    else:
+        put, get, size = current.append, current.popleft, current.__len__
+    for index in seeds:
+        put(index)
+        pathlength[index] = 0
+    while size():
+        index = get()
+        for neighbor in neighbors[index]:
+            if not blocked[neighbor] and pathlength[neighbor] == -1:
+                pathlength[neighbor] = pathlength[index] + 1
+                put(neighbor)
+    return pathlength
+
+def best_time(function, rounds):
+    best = None
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(rounds=20):
+    game_state = make_board()
+    game_map = game_state.game_map
+    starts = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+    game_state.find_path_to_edge(starts[0])
+    path_finder = game_state._shortest_path_finder
+    neighbors = path_finder._neighbors
+    blocked = game_map.blocked_mask
+    seeds = [x * game_map.ARENA_SIZE + y for x, y in game_map.get_edge_locations(game_map.TOP_RIGHT)]
+
+    fields = [breadth_first_search(neighbors, blocked, seeds, frontier_type) for frontier_type in [queue.Queue, deque]]
+    assert fields[0] == fields[1], "Both frontiers should give the same pathlengths"
+    for name, frontier_type in [("queue.Queue", queue.Queue), ("deque", deque)]:
+        elapsed = best_time(lambda: breadth_first_search(neighbors, blocked, seeds, frontier_type), rounds)
+        print("Breadth first search with {}: {:.1f}us".format(name, elapsed * 1e6))
+
+    cache = path_finder.field_cache
+    maxsize = cache.maxsize
+    cache.maxsize = 0
+    uncached = best_time(lambda: [game_state.find_path_to_edge(start) for start in starts], rounds) / len(starts)
+    cache.maxsize = maxsize
+    cache.clear()
+    cached = best_time(lambda: [game_state.find_path_to_edge(start) for start in starts], rounds) / len(starts)
+    print("find_path_to_edge: {:.1f}us per uncached path, {:.1f}us per cached path".format(uncached * 1e6, cached * 1e6))
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))